@@ -0,0 +1,19 @@
+"""Офлайн-бенчмарки бота: локальні фікстури замість OLX/Otodom і заглушка Telegram Bot API"""
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+def prepare_bot_environment(workdir):
+    """Налаштовує середовище для імпорту bot.py: тестовий токен, кеші в workdir, без сервера метрик"""
+    # Бот читає налаштування при імпорті, тому викликати до import bot
+    os.environ.update({
+        'BOT_TOKEN': '123456:benchmark',
+        'CACHE_DB': str(Path(workdir) / 'cache.sqlite3'),
+        'IMAGE_CACHE_DIR': str(Path(workdir) / 'image_cache'),
+        'TRACE_FILE': str(Path(workdir) / 'traces.jsonl'),
+        'METRICS_PORT': '0',
+    })
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
@@ -0,0 +1,116 @@
+"""Локальний HTTP-сервер з фікстурами оголошень OLX/Otodom і фото"""
+import io
+import json
+import random
+import asyncio
+
+from aiohttp import web
+from PIL import Image
+
+def make_photo(seed, size, image_format='JPEG'):
+    """Генерує фото з випадковими плавними плямами: стискається приблизно як справжнє фото"""
+    rnd = random.Random(seed)
+    small = Image.new('RGB', (24, 18))
+    small.putdata([(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)) for _ in range(24 * 18)])
+    image = small.resize(size, Image.BICUBIC)
+    
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=88)
+    else:
+        image.save(buffer, image_format)
+    return buffer.getvalue()
+
+class FixtureServer:
+    """Віддає сторінки оголошень з вбудованим JSON-станом і фото за шляхами, схожими на apollo.olxcdn.com"""
+    
+    def __init__(self, listings=5, photos_per_listing=12, photo_size=(1200, 900), latency=0.0, host='127.0.0.1', port=0):
+        self.listings = listings
+        self.photos_per_listing = photos_per_listing
+        self.photo_size = photo_size
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.requests = 0
+        self.bytes_sent = 0
+        self._photos = {}
+    
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+    
+    def photo_id(self, listing, index):
+        return f"bench-{listing}-{index}"
+    
+    def photo_url(self, listing, index):
+        # Парсери бота приймають лише URL з apollo.olxcdn.com, тому домен CDN входить у шлях
+        return f"{self.base_url}/apollo.olxcdn.com/v1/files/{self.photo_id(listing, index)}/image"
+    
+    def listing_urls(self, site):
+        """URL усіх оголошень фікстури для сайту 'olx' або 'otodom'"""
+        if site == 'olx':
+            return [f"{self.base_url}/d/oferta/bench-{listing}.html" for listing in range(self.listings)]
+        return [f"{self.base_url}/pl/oferta/bench-{listing}" for listing in range(self.listings)]
+    
+    def photo_bytes(self, photo_id):
+        if photo_id not in self._photos:
+            self._photos[photo_id] = make_photo(photo_id, self.photo_size)
+        return self._photos[photo_id]
+    
+    def otodom_page(self, listing):
+        data = {'props': {'pageProps': {'ad': {'images': [
+            {'large': self.photo_url(listing, index) + ';s=1280x1024', 'small': self.photo_url(listing, index) + ';s=184x138'}
+            for index in range(self.photos_per_listing)
+        ]}}}}
+        return (
+            "<html><head><title>Otodom</title></head><body>"
+            f"<script id=\"__NEXT_DATA__\" type=\"application/json\">{json.dumps(data)}</script>"
+            "</body></html>"
+        )
+    
+    def olx_page(self, listing):
+        state = {'ad': {'ad': {'photos': [
+            {'link': self.photo_url(listing, index) + ';s={width}x{height}'}
+            for index in range(self.photos_per_listing)
+        ]}}}
+        return (
+            "<html><head><title>OLX</title></head><body>"
+            f"<script>window.__PRERENDERED_STATE__ = {json.dumps(json.dumps(state))};</script>"
+            "</body></html>"
+        )
+    
+    async def _respond(self, body, content_type):
+        self.requests += 1
+        self.bytes_sent += len(body)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(body=body, content_type=content_type)
+    
+    async def handle_otodom(self, request):
+        listing = int(request.match_info['listing'])
+        return await self._respond(self.otodom_page(listing).encode('utf-8'), 'text/html')
+    
+    async def handle_olx(self, request):
+        listing = int(request.match_info['listing'])
+        return await self._respond(self.olx_page(listing).encode('utf-8'), 'text/html')
+    
+    async def handle_photo(self, request):
+        return await self._respond(self.photo_bytes(request.match_info['photo_id']), 'image/jpeg')
+    
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/pl/oferta/bench-{listing:\\d+}', self.handle_otodom)
+        app.router.add_get('/d/oferta/bench-{listing:\\d+}.html', self.handle_olx)
+        # Як і справжній CDN, розмір у ;s=... ігноруємо і віддаємо оригінал
+        app.router.add_get('/apollo.olxcdn.com/v1/files/{photo_id}/{variant}', self.handle_photo)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,156 @@
+"""Мікробенчмарк обробки одного фото: окремі етапи process_image_bytes на згенерованому корпусі
+
+Запуск з кореня репозиторію:
+
+    python -m benchmarks.images
+    python -m benchmarks.images --repeat 10 --format JPEG --compare old.json
+
+Для кожного фото корпусу (JPEG/WebP/PNG, від 640 px до 4000 px) міряється медіанний час
+етапу і пік пам'яті. tracemalloc бачить лише Python-об'єкти (наприклад, tobytes() чи
+готовий JPEG), а піксельні буфери Pillow виділяє поза ним, тому окремо наводиться
+розмір декодованого зображення (pixels_mb).
+"""
+import io
+import json
+import time
+import hashlib
+import logging
+import argparse
+import statistics
+import tracemalloc
+from pathlib import Path
+
+from PIL import Image
+
+import image_pipeline
+from benchmarks.fixtures import make_photo
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+RESOLUTIONS = [(640, 480), (1280, 960), (1920, 1440), (4000, 3000)]
+# PNG з альфа-каналом перевіряє гілку конвертації RGBA -> RGB
+FORMATS = ['JPEG', 'WEBP', 'PNG']
+
+def build_corpus(formats):
+    corpus = []
+    for image_format in formats:
+        for width, height in RESOLUTIONS:
+            data = make_photo(f"{image_format}-{width}", (width, height), 'JPEG')
+            if image_format != 'JPEG':
+                image = Image.open(io.BytesIO(data))
+                if image_format == 'PNG':
+                    image = image.convert('RGBA')
+                buffer = io.BytesIO()
+                image.save(buffer, image_format)
+                data = buffer.getvalue()
+            corpus.append({'name': f"{image_format.lower()}_{width}x{height}", 'format': image_format, 'data': data})
+    return corpus
+
+def build_stages():
+    """Етапи конвеєра: кожен отримує байти файлу і готує вхідні дані сам, поза заміром"""
+    def opened(data):
+        return Image.open(io.BytesIO(data))
+    
+    def loaded(data):
+        image = opened(data)
+        image.load()
+        return image
+    
+    def rgb(data):
+        image = loaded(data)
+        return image.convert('RGB') if image.mode in ('RGBA', 'P') else image
+    
+    def draft_decode(image):
+        # Те саме, що робить process_image_bytes для фото, більших за TARGET_LONG_EDGE
+        image = image_pipeline.shrink_to_long_edge(image, image_pipeline.TARGET_LONG_EDGE)
+        image.load()
+        return image
+    
+    def save_jpeg(image):
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return output.getvalue()
+    
+    # (назва, підготовка входу, функція етапу)
+    return [
+        ('open_header', lambda data: data, lambda data: opened(data).size),
+        ('decode_full', lambda data: data, lambda data: loaded(data)),
+        ('decode_draft', opened, draft_decode),
+        ('convert_rgb', loaded, lambda image: image.convert('RGB') if image.mode in ('RGBA', 'P') else image),
+        ('size_check', loaded, lambda image: image.width < image_pipeline.MIN_WIDTH or image.height < image_pipeline.MIN_HEIGHT),
+        ('md5_tobytes', rgb, lambda image: hashlib.md5(image.tobytes()).hexdigest()),
+        ('dhash', rgb, image_pipeline.compute_dhash),
+        ('crop_watermark', rgb, lambda image: image_pipeline.crop_watermark(image).load()),
+        ('jpeg_save_q90', rgb, save_jpeg),
+        ('process_olx', lambda data: data, lambda data: image_pipeline.process_image_bytes(data, False)),
+        ('process_otodom', lambda data: data, lambda data: image_pipeline.process_image_bytes(data, True)),
+    ]
+
+def measure(prepare, stage, data, repeat):
+    """Медіанний час етапу (мс) і пік Python-пам'яті за окремий прогін (КБ)"""
+    timings = []
+    for _ in range(repeat):
+        value = prepare(data)
+        started = time.perf_counter()
+        stage(value)
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    value = prepare(data)
+    tracemalloc.start()
+    try:
+        stage(value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(timings), 3), round(peak / 1024, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Мікробенчмарк обробки фото")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="повторів кожного етапу")
+    parser.add_argument('-f', '--format', action='append', choices=FORMATS, help="формати корпусу (можна кілька)")
+    parser.add_argument('-o', '--output', help="файл JSON з результатами (за замовчуванням benchmarks/results/)")
+    parser.add_argument('--compare', help="JSON попереднього запуску для порівняння")
+    args = parser.parse_args()
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    corpus = build_corpus(args.format or FORMATS)
+    stages = build_stages()
+    baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))['images'] if args.compare else {}
+    
+    results = {}
+    print(f"{'фото':<18}{'КБ':>8}{'pixels_mb':>11}  " + ''.join(f"{name:>16}" for name, _, _ in stages))
+    for item in corpus:
+        image = Image.open(io.BytesIO(item['data']))
+        row = {
+            'format': item['format'],
+            'file_kb': round(len(item['data']) / 1024, 1),
+            'pixels_mb': round(image.width * image.height * len(image.getbands()) / 1024 / 1024, 1),
+            'stages': {},
+        }
+        line = f"{item['name']:<18}{row['file_kb']:>8}{row['pixels_mb']:>11}  "
+        for name, prepare, stage in stages:
+            time_ms, peak_kb = measure(prepare, stage, item['data'], args.repeat)
+            row['stages'][name] = {'time_ms': time_ms, 'py_peak_kb': peak_kb}
+            
+            cell = f"{time_ms:.1f}"
+            previous = baseline.get(item['name'], {}).get('stages', {}).get(name, {}).get('time_ms')
+            if previous:
+                cell += f" ({(time_ms - previous) / previous * 100:+.0f}%)"
+            line += f"{cell:>16}"
+        results[item['name']] = row
+        print(line, flush=True)
+    
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'target_long_edge': image_pipeline.TARGET_LONG_EDGE,
+        'images': results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"images-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\n💾 Результати: {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Наскрізний офлайн-бенчмарк: витягування фото + process_and_send_photos на локальних фікстурах
+
+Запуск з кореня репозиторію:
+
+    python -m benchmarks.run                          # усі сценарії
+    python -m benchmarks.run -s olx_cold -s olx_warm  # вибрані сценарії
+    python -m benchmarks.run --compare benchmarks/results/old.json
+
+Кожен сценарій виконується в окремому процесі зі свіжими кешами, тому пікова RSS
+не змішується між сценаріями. Результати записуються в JSON.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+from benchmarks import REPO_ROOT, prepare_bot_environment
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# site: olx, otodom або mixed; passes: скільки разів пройти по оголошеннях (міряється останній прохід)
+SCENARIOS = {
+    'otodom_cold': {'site': 'otodom', 'listings': 5, 'photos': 12, 'concurrency': 1, 'passes': 1},
+    'olx_cold': {'site': 'olx', 'listings': 5, 'photos': 12, 'concurrency': 1, 'passes': 1},
+    'olx_warm': {'site': 'olx', 'listings': 5, 'photos': 12, 'concurrency': 1, 'passes': 2},
+    'mixed_concurrent': {'site': 'mixed', 'listings': 8, 'photos': 12, 'concurrency': 4, 'passes': 1},
+}
+
+def percentile(values, q):
+    """Перцентиль методом найближчого рангу"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def peak_rss_mb(who):
+    # ru_maxrss у Linux - кілобайти, у macOS - байти
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(who).ru_maxrss / divisor, 1)
+
+async def run_scenario(name, config, args, workdir):
+    """Виконується в дочірньому процесі: імпортує бота і проганяє сценарій"""
+    prepare_bot_environment(workdir)
+    import bot
+    from telegram import Bot, Update
+    from benchmarks.fixtures import FixtureServer
+    from benchmarks.telegram_stub import TelegramStub
+    
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    
+    fixtures = FixtureServer(listings=config['listings'], photos_per_listing=config['photos'], latency=args.cdn_latency)
+    telegram = TelegramStub(latency=args.telegram_latency, upload_bandwidth=args.upload_bandwidth)
+    await fixtures.start()
+    await telegram.start()
+    await bot.http_client.start()
+    
+    tg_bot = Bot('123456:benchmark', base_url=telegram.base_url)
+    await tg_bot.initialize()
+    
+    if config['site'] == 'mixed':
+        olx_urls, otodom_urls = fixtures.listing_urls('olx'), fixtures.listing_urls('otodom')
+        urls = [url for pair in zip(olx_urls, otodom_urls) for url in pair][:config['listings']]
+    else:
+        urls = fixtures.listing_urls(config['site'])
+    
+    def make_update(index, url):
+        return Update.de_json({
+            'update_id': index,
+            'message': {
+                'message_id': index,
+                'date': int(time.time()),
+                'chat': {'id': 1, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': False, 'first_name': 'bench'},
+                'text': url,
+            },
+        }, tg_bot)
+    
+    async def run_listing(index, url, semaphore):
+        async with semaphore:
+            update = make_update(index, url)
+            session = bot.http_client.session
+            is_olx = '/d/oferta/' in url
+            started = time.perf_counter()
+            if is_olx:
+                photo_urls = await bot.photo_extractor.get_olx_photos(url, session)
+            else:
+                photo_urls = await bot.photo_extractor.get_gallery_photos(url, session)
+            sent = await bot.process_and_send_photos(photo_urls, update, session, is_olx)
+            return time.perf_counter() - started, sent
+    
+    try:
+        for _ in range(config['passes']):
+            semaphore = asyncio.Semaphore(config['concurrency'])
+            photos_before = telegram.photos
+            started = time.perf_counter()
+            results = await asyncio.gather(*(run_listing(i, url, semaphore) for i, url in enumerate(urls, 1)))
+            wall_time = time.perf_counter() - started
+        
+        latencies = [latency for latency, _ in results]
+        photos_sent = sum(sent for _, sent in results)
+        return {
+            'config': config,
+            'listings': len(urls),
+            'photos_sent': photos_sent,
+            'telegram_photos': telegram.photos - photos_before,
+            'wall_time_s': round(wall_time, 3),
+            'latency_p50_s': round(percentile(latencies, 50), 3),
+            'latency_p95_s': round(percentile(latencies, 95), 3),
+            'latency_max_s': round(max(latencies), 3),
+            'photos_per_s': round(photos_sent / wall_time, 2) if wall_time else None,
+            'fixture_requests': fixtures.requests,
+            'fixture_bytes': fixtures.bytes_sent,
+            'telegram_calls': telegram.calls,
+            'telegram_bytes': telegram.bytes_received,
+            'http': bot.http_client.get_stats(),
+        }
+    finally:
+        await tg_bot.shutdown()
+        await bot.http_client.close()
+        await telegram.stop()
+        await fixtures.stop()
+        # Чекаємо процеси обробки фото, щоб їхня пам'ять потрапила в RUSAGE_CHILDREN
+        bot.image_processor.shutdown(wait=True)
+
+def run_child(args):
+    name = args.child
+    config = {**SCENARIOS[name]}
+    if args.listings:
+        config['listings'] = args.listings
+    if args.photos:
+        config['photos'] = args.photos
+    
+    with tempfile.TemporaryDirectory(prefix=f'bench-{name}-') as workdir:
+        result = asyncio.run(run_scenario(name, config, args, Path(workdir)))
+    
+    result['peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_SELF)
+    result['peak_rss_children_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    # stdout зайнятий діагностикою бота, тому результат іде окремим файлом
+    Path(args.result_file).write_text(json.dumps(result), encoding='utf-8')
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_parent(args):
+    names = args.scenario or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Невідомі сценарії: {', '.join(unknown)}. Доступні: {', '.join(SCENARIOS)}")
+    
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'options': {
+            'cdn_latency': args.cdn_latency,
+            'telegram_latency': args.telegram_latency,
+            'upload_bandwidth': args.upload_bandwidth,
+        },
+        'scenarios': {},
+    }
+    
+    for name in names:
+        print(f"▶️  {name}...", flush=True)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as result_file:
+            result_path = Path(result_file.name)
+        
+        command = [
+            sys.executable, '-m', 'benchmarks.run', '--child', name, '--result-file', str(result_path),
+            '--cdn-latency', str(args.cdn_latency), '--telegram-latency', str(args.telegram_latency),
+        ]
+        if args.upload_bandwidth:
+            command += ['--upload-bandwidth', str(args.upload_bandwidth)]
+        if args.listings:
+            command += ['--listings', str(args.listings)]
+        if args.photos:
+            command += ['--photos', str(args.photos)]
+        if args.verbose:
+            command.append('--verbose')
+        
+        completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=not args.verbose, text=True)
+        try:
+            if completed.returncode != 0:
+                print(completed.stderr[-2000:] if completed.stderr else '', file=sys.stderr)
+                report['scenarios'][name] = {'error': f"exit code {completed.returncode}"}
+                continue
+            report['scenarios'][name] = json.loads(result_path.read_text(encoding='utf-8'))
+        finally:
+            result_path.unlink(missing_ok=True)
+    
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    
+    baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))['scenarios'] if args.compare else {}
+    print_report(report['scenarios'], baseline)
+    print(f"\n💾 Результати: {output}")
+
+def print_report(scenarios, baseline):
+    columns = ('latency_p50_s', 'latency_p95_s', 'photos_per_s', 'peak_rss_mb', 'peak_rss_children_mb')
+    print(f"\n{'сценарій':<20}" + ''.join(f"{column:>24}" for column in columns))
+    for name, result in scenarios.items():
+        if 'error' in result:
+            print(f"{name:<20}  ❌ {result['error']}")
+            continue
+        row = f"{name:<20}"
+        for column in columns:
+            value = result.get(column)
+            cell = f"{value}"
+            previous = baseline.get(name, {}).get(column)
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+                cell += f" ({(value - previous) / previous * 100:+.0f}%)"
+            row += f"{cell:>24}"
+        print(row)
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк обробки оголошень")
+    parser.add_argument('-s', '--scenario', action='append', help=f"сценарій (можна кілька): {', '.join(SCENARIOS)}")
+    parser.add_argument('-o', '--output', help="файл JSON з результатами (за замовчуванням benchmarks/results/)")
+    parser.add_argument('--compare', help="JSON попереднього запуску для порівняння")
+    parser.add_argument('--cdn-latency', type=float, default=0.05, help="затримка відповіді фікстур, с")
+    parser.add_argument('--telegram-latency', type=float, default=0.2, help="затримка відповіді заглушки Telegram, с")
+    parser.add_argument('--upload-bandwidth', type=float, help="швидкість завантаження в Telegram, байт/с")
+    parser.add_argument('--listings', type=int, help="перевизначає кількість оголошень у сценарії")
+    parser.add_argument('--photos', type=int, help="перевизначає кількість фото в оголошенні")
+    parser.add_argument('-v', '--verbose', action='store_true', help="показувати логи бота")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args)
+    else:
+        run_parent(args)
+
+if __name__ == '__main__':
+    main()
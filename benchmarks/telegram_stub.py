@@ -0,0 +1,102 @@
+"""Заглушка Telegram Bot API: приймає виклики бота локально і рахує відправлені фото"""
+import json
+import time
+import asyncio
+import itertools
+
+from aiohttp import web
+
+class TelegramStub:
+    """Мінімальний Bot API для python-telegram-bot: getMe, повідомлення, альбоми, документи"""
+    
+    def __init__(self, latency=0.0, upload_bandwidth=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        # Байт/с для імітації завантаження фото в Telegram (None - без обмеження)
+        self.upload_bandwidth = upload_bandwidth
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.calls = {}
+        self.photos = 0
+        self.bytes_received = 0
+        self._ids = itertools.count(1)
+    
+    @property
+    def base_url(self):
+        """Значення для Bot(base_url=...): токен дописується бібліотекою"""
+        return f"http://{self.host}:{self.port}/bot"
+    
+    def _message(self, chat_id, **fields):
+        return {
+            'message_id': next(self._ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            **fields,
+        }
+    
+    def _photo(self, width=1280, height=960):
+        file_number = next(self._ids)
+        return [{
+            'file_id': f"stub-file-{file_number}",
+            'file_unique_id': f"stub-unique-{file_number}",
+            'width': width,
+            'height': height,
+        }]
+    
+    async def _read_params(self, request):
+        """Bot API приймає і JSON, і multipart (коли є файли)"""
+        if request.content_type == 'application/json':
+            return await request.json(), 0
+        
+        params = {}
+        uploaded = 0
+        form = await request.post()
+        for key, value in form.items():
+            if isinstance(value, web.FileField):
+                uploaded += len(value.file.read())
+            else:
+                params[key] = value
+        return params, uploaded
+    
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params, uploaded = await self._read_params(request)
+        self.bytes_received += uploaded
+        
+        delay = self.latency
+        if self.upload_bandwidth:
+            delay += uploaded / self.upload_bandwidth
+        if delay:
+            await asyncio.sleep(delay)
+        
+        chat_id = params.get('chat_id', 0)
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        elif method == 'sendMediaGroup':
+            media = params['media']
+            if isinstance(media, str):
+                media = json.loads(media)
+            self.photos += len(media)
+            result = [self._message(chat_id, photo=self._photo()) for _ in media]
+        elif method in ('sendMessage', 'editMessageText'):
+            result = self._message(chat_id, text=params.get('text', ''))
+        elif method == 'sendDocument':
+            result = self._message(chat_id, document={'file_id': 'stub-document', 'file_unique_id': 'stub-document'})
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+    
+    async def start(self):
+        app = web.Application(client_max_size=100 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
@@ -1,12 +1,14 @@
 import logging
-from io import BytesIO
+import logging.handlers
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
 )
 from telegram import InputMediaPhoto
-from PIL import Image
+from telegram.error import BadRequest, RetryAfter
+import numpy as np
 import aiohttp
+from aiohttp import web
 import ssl
 import os
 import certifi
@@ -14,7 +16,17 @@ import requests
 import re
 import json
 import asyncio
-from urllib.parse import urljoin, unquote, urlparse
+import contextlib
+import contextvars
+import hmac
+import signal
+import sys
+import uuid
+import cProfile
+import pstats
+from collections import Counter
+from collections import OrderedDict, deque
+from urllib.parse import urljoin, unquote, urlparse, urlunparse, parse_qsl, urlencode
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -23,11 +35,22 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import (
+    TimeoutException, NoSuchElementException, StaleElementReferenceException, JavascriptException
+)
 import base64
 import time
 import hashlib
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import wraps
+import image_pipeline
+from image_pipeline import MIN_WIDTH, MIN_HEIGHT, TARGET_LONG_EDGE, available_cpu_count, crop_watermark
 
 # === 🔑 TOKEN ===
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
@@ -57,8 +80,102 @@ if not BOT_TOKEN:
 # === ⚙️ SETTINGS ===
 PHOTOS_PER_ALBUM = 10
 REQUEST_TIMEOUT = 60
-MIN_WIDTH = 275
-MIN_HEIGHT = 250
+
+# Кількість одночасних Selenium-витягувань (потоків виконавця)
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 3))
+
+# Одночасні задачі: браузерні (Chrome) та завантаження/відправки фото
+BROWSER_JOB_LIMIT = int(os.environ.get('BROWSER_JOB_LIMIT', EXTRACTION_WORKERS))
+IMAGE_JOB_LIMIT = int(os.environ.get('IMAGE_JOB_LIMIT', 4))
+
+# Пакетний режим: скільки оголошень з одного повідомлення обробляти одночасно і максимум посилань
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 3))
+BULK_MAX_LINKS = int(os.environ.get('BULK_MAX_LINKS', 30))
+BULK_FILE_MAX_BYTES = 256 * 1024
+
+# Посилання на оголошення всередині довільного тексту
+LISTING_URL_PATTERN = re.compile(r"https?://(?:www\.)?(?:otodom\.pl|olx\.pl)/[^\s<>\"']+")
+# Розділові знаки, що стоять після посилання в реченні, а не є його частиною
+LISTING_URL_TRAILING = '.,;:!?)]}»'
+
+# Пул Chrome: мінімум прогрітих, максимум одночасних, перезапуск після N використань
+DRIVER_POOL_MIN = int(os.environ.get('DRIVER_POOL_MIN', 1))
+DRIVER_POOL_MAX = int(os.environ.get('DRIVER_POOL_MAX', EXTRACTION_WORKERS))
+DRIVER_MAX_USES = int(os.environ.get('DRIVER_MAX_USES', 20))
+
+# Таймаут завантаження HTML для швидкого шляху без браузера
+HTML_TIMEOUT = 15
+
+# Верхні межі очікувань у браузері (секунди) для кожного кроку
+WAIT_TIMEOUTS = {
+    'page_ready': 15,
+    'network_idle': 5,
+    'photos_button': 10,
+    'gallery_images': 10,
+    'gallery_open': 5,
+    'next_photo': 4,
+}
+# Стратегія завантаження сторінки в Chrome: eager - не чекати картинок, шрифтів і фреймів
+PAGE_LOAD_STRATEGY = os.environ.get('PAGE_LOAD_STRATEGY', 'eager')
+
+# Блокування важких ресурсів у Chrome через DevTools (Network.setBlockedURLs)
+BLOCK_PAGE_RESOURCES = os.environ.get('BLOCK_PAGE_RESOURCES', '1') != '0'
+BLOCKED_TRACKER_PATTERNS = [
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*googleadservices.com*', '*adservice.google.*', '*facebook.net*', '*hotjar.com*', '*criteo.*',
+    '*adnxs.com*', '*rubiconproject.com*', '*pubmatic.com*', '*scorecardresearch.com*', '*gemius.pl*',
+    '*clarity.ms*', '*nr-data.net*',
+]
+BLOCKED_FONT_MEDIA_PATTERNS = ['*.woff*', '*.ttf*', '*.otf*', '*.mp4*', '*.webm*', '*.m3u8*', '*youtube.com/embed*']
+# Зображення не блокуємо на жодному сайті: обидва потоки фільтрують фото за naturalWidth,
+# а OLX ще й шукає видиму велику картинку, щоб відкрити галерею
+BLOCKED_URL_PATTERNS = {
+    'olx': BLOCKED_TRACKER_PATTERNS + BLOCKED_FONT_MEDIA_PATTERNS,
+    'otodom': BLOCKED_TRACKER_PATTERNS + BLOCKED_FONT_MEDIA_PATTERNS,
+}
+
+# Мережа вважається вільною, якщо нових запитів немає протягом цього часу
+NETWORK_IDLE_WINDOW = 0.5
+WAIT_POLL_INTERVAL = 0.1
+
+# Паралельні завантаження фото: загальний ліміт і ліміт з'єднань на один хост
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', 8))
+DOWNLOAD_PER_HOST = int(os.environ.get('DOWNLOAD_PER_HOST', 6))
+
+# Спільний пул HTTP-з'єднань: загальний ліміт, кеш DNS і час життя keep-alive (секунди)
+HTTP_POOL_LIMIT = int(os.environ.get('HTTP_POOL_LIMIT', 100))
+DNS_CACHE_TTL = int(os.environ.get('DNS_CACHE_TTL', 300))
+HTTP_KEEPALIVE_TIMEOUT = int(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', 60))
+
+# Кількість процесів для декодування/кодування фото. os.cpu_count() у контейнері повертає
+# процесори хоста, тому рахуємо доступні процесу і обмежуємо: кожен процес - окремий інтерпретатор
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', min(4, available_cpu_count())))
+
+# Максимальна відстань Геммінга між dHash (з 64 біт), за якої фото вважаються однаковими
+PHASH_THRESHOLD = int(os.environ.get('PHASH_THRESHOLD', 4))
+
+# Скільки готових альбомів можуть чекати на відправку (обмежує пам'ять)
+ALBUM_QUEUE_DEPTH = int(os.environ.get('ALBUM_QUEUE_DEPTH', 2))
+# Мінімальний інтервал між відправками альбомів (секунди)
+ALBUM_SEND_INTERVAL = 1.0
+# Скільки разів повторювати відправку альбому після RetryAfter (flood control)
+ALBUM_SEND_RETRIES = 3
+
+# Режим отримання оновлень: polling (за замовчуванням) або webhook
+BOT_MODE = os.environ.get('BOT_MODE', 'polling').lower()
+# Вбудований сервер вебхука: порт, шлях, секрет і публічна адреса (якщо задана - вебхук реєструється в Telegram)
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', os.environ.get('PORT', 8080)))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+# Скільки чекати завершення поточних задач при зупинці (секунди)
+SHUTDOWN_DRAIN_TIMEOUT = int(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', 120))
+
+# Локальний endpoint метрик Prometheus (0 - вимкнено)
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9100))
+# Межі кошиків гістограм тривалості етапів (секунди)
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
 
 # === 🔐 ACCESS CONTROL ===
 ADMIN_ID = 723935749
@@ -71,6 +188,29 @@ ALLOWED_USERS = {
 # Файл для збереження списку користувачів
 USERS_FILE = "allowed_users.json"
 
+# Файл SQLite для кешів між перезапусками
+CACHE_DB = os.environ.get('CACHE_DB', 'bot_cache.sqlite3')
+
+# Кеш списків фото оголошень: час життя (секунди) і максимальна кількість записів
+LISTING_CACHE_TTL = int(os.environ.get('LISTING_CACHE_TTL', 6 * 60 * 60))
+LISTING_CACHE_SIZE = int(os.environ.get('LISTING_CACHE_SIZE', 500))
+
+# Дисковий кеш оброблених JPEG: каталог і загальний бюджет байтів
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+
+# Трасування: JSONL-файл зі спанами етапів, ротація за розміром
+TRACE_FILE = os.environ.get('TRACE_FILE', 'bot_traces.jsonl')
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', 10 * 1024 * 1024))
+TRACE_FILE_BACKUPS = int(os.environ.get('TRACE_FILE_BACKUPS', 3))
+
+# Профілювання за командою /profile: інтервал семплювання стеків і максимум оголошень
+PROFILE_SAMPLE_INTERVAL = 0.01
+PROFILE_MAX_JOBS = 50
+
+# Параметри запиту, які не впливають на оголошення (трекінг)
+TRACKING_QUERY_PARAMS = {'fbclid', 'gclid', 'reason', 'search_reason', 'ad_reason', 'bs', 'ref', 'isPreviewActive'}
+
 # === 🧾 LOGGING ===
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -116,15 +256,19 @@ def admin_required(func):
         return await func(update, context)
     return wrapper
 
+def log_user_command(update: Update):
+    """Логує текст повідомлення користувача як команду"""
+    user_id = update.effective_user.id
+    username = update.effective_user.username or update.effective_user.first_name
+    command = update.message.text
+    
+    logger.info(f"📝 Команда від {username} (ID: {user_id}): {command}")
+
 def log_command(func):
     """Декоратор для логування всіх команд"""
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = update.effective_user.id
-        username = update.effective_user.username or update.effective_user.first_name
-        command = update.message.text
-        
-        logger.info(f"📝 Команда від {username} (ID: {user_id}): {command}")
+        log_user_command(update)
         return await func(update, context)
     return wrapper
 
@@ -210,12 +354,1288 @@ class UserManager:
         """Перевіряє чи має користувач доступ"""
         return user_id in ALLOWED_USERS
 
+class HttpClient:
+    """Спільна aiohttp-сесія застосунку з пулом з'єднань і статистикою їх перевикористання"""
+    
+    def __init__(self):
+        self.session = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+    
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        self.requests += 1
+    
+    async def _on_connection_create_end(self, session, trace_config_ctx, params):
+        self.connections_created += 1
+    
+    async def _on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self.connections_reused += 1
+    
+    async def start(self):
+        """Створює сесію; викликається при запуску застосунку"""
+        if self.session and not self.session.closed:
+            return
+        
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=DOWNLOAD_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        self.session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+        logger.info("🌐 HTTP-сесію створено")
+    
+    async def close(self):
+        """Закриває сесію; викликається при зупинці застосунку"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+            logger.info("🔚 HTTP-сесію закрито")
+        self.session = None
+    
+    def get_stats(self):
+        """Повертає статистику перевикористання з'єднань"""
+        connections = self.connections_created + self.connections_reused
+        return {
+            'requests': self.requests,
+            'created': self.connections_created,
+            'reused': self.connections_reused,
+            'hit_rate': self.connections_reused / connections if connections else 0.0,
+        }
+
+# Глобальний HTTP-клієнт
+http_client = HttpClient()
+
+class ExtractionExecutor:
+    """Виконує блокуючі Selenium-витягування в пулі потоків, не блокуючи event loop"""
+    
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extractor")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.total_queue_wait = 0.0
+        self.total_extraction_time = 0.0
+    
+    async def run(self, func, *args):
+        """Запускає func(*args) у потоці виконавця і повертає результат"""
+        loop = asyncio.get_running_loop()
+        submitted_at = time.monotonic()
+        with self._lock:
+            self.queued += 1
+        
+        # Контекст (trace id, поточний спан) переходить у потік виконавця
+        context = contextvars.copy_context()
+        
+        def task():
+            started_at = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return func(*args), started_at
+            finally:
+                with self._lock:
+                    self.active -= 1
+        
+        result, started_at = await loop.run_in_executor(self._executor, context.run, task)
+        queue_wait = started_at - submitted_at
+        extraction_time = time.monotonic() - started_at
+        
+        with self._lock:
+            self.completed += 1
+            self.total_queue_wait += queue_wait
+            self.total_extraction_time += extraction_time
+        
+        logger.info(f"⏱️ {func.__name__}: черга {queue_wait:.2f}с, витягування {extraction_time:.2f}с")
+        return result
+    
+    def get_stats(self):
+        """Повертає поточний стан виконавця"""
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                'workers': self.max_workers,
+                'active': self.active,
+                'queued': self.queued,
+                'completed': self.completed,
+                'avg_queue_wait': self.total_queue_wait / completed,
+                'avg_extraction_time': self.total_extraction_time / completed,
+            }
+
+# Глобальний виконавець витягувань
+extraction_executor = ExtractionExecutor(EXTRACTION_WORKERS)
+
+# === 📈 METRICS ===
+class Metrics:
+    """Лічильники, гістограми та gauge у текстовому форматі Prometheus"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+    
+    def describe(self, name, metric_type, help_text):
+        self._meta[name] = (metric_type, help_text)
+    
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items() if value))
+    
+    def inc(self, name, value=1, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+    
+    @contextlib.contextmanager
+    def time_stage(self, stage, site=None):
+        """Вимірює тривалість етапу (в тому числі невдалого)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('bot_stage_duration_seconds', time.perf_counter() - started, stage=stage, site=site)
+    
+    def gauge(self, name, func):
+        """Реєструє gauge, значення якого читається під час збору метрик"""
+        self._gauges[name] = func
+    
+    @staticmethod
+    def _format(name, labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return name
+        rendered = ','.join(f'{key}="{value}"' for key, value in pairs)
+        return f'{name}{{{rendered}}}'
+    
+    def render(self):
+        """Повертає всі метрики у текстовому форматі Prometheus"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, 'buckets': list(value['buckets'])} for key, value in self._histograms.items()}
+        
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f"{self._format(name, labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append(f"{self._format(name + '_bucket', labels, [('le', bound)])} {count}")
+            lines.append(f"{self._format(name + '_bucket', labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{self._format(name + '_sum', labels)} {histogram['sum']:.6f}")
+            lines.append(f"{self._format(name + '_count', labels)} {histogram['count']}")
+        for name, func in self._gauges.items():
+            try:
+                samples[name] = [f"{name} {func()}"]
+            except Exception as e:
+                logger.warning(f"⚠️ Не вдалося прочитати метрику {name}: {e}")
+        
+        output = []
+        for name in sorted(samples):
+            metric_type, help_text = self._meta.get(name, ('untyped', ''))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+# Глобальні метрики
+metrics = Metrics(METRICS_BUCKETS)
+metrics.describe('bot_stage_duration_seconds', 'histogram', 'Тривалість етапів обробки оголошення')
+metrics.describe('bot_jobs_started_total', 'counter', 'Розпочаті оголошення')
+metrics.describe('bot_jobs_finished_total', 'counter', 'Оголошення, з яких відправлено хоча б одне фото')
+metrics.describe('bot_jobs_failed_total', 'counter', 'Оголошення, що завершились помилкою або без фото')
+metrics.describe('bot_photos_total', 'counter', 'Фото за результатом: downloaded, cached, filtered, deduped, failed')
+metrics.describe('bot_bytes_in_total', 'counter', 'Байти фото, завантажені з сайтів')
+metrics.describe('bot_bytes_out_total', 'counter', 'Байти фото, відправлені в Telegram')
+metrics.describe('bot_chrome_instances_alive', 'gauge', 'Запущені екземпляри Chrome')
+
+class MetricsServer:
+    """Невеликий локальний HTTP-сервер, що віддає /metrics"""
+    
+    def __init__(self, registry, host, port):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+    
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+    
+    async def start(self):
+        if not self.port or self.runner:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.host, self.port).start()
+        except OSError as e:
+            logger.error(f"❌ Не вдалося запустити сервер метрик: {e}")
+            await self.stop()
+            return
+        logger.info(f"📈 Метрики доступні на http://{self.host}:{self.port}/metrics")
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT)
+
+# === 🧵 TRACING ===
+# Трасування поточного оголошення і поточний спан (для вкладеності)
+current_trace = contextvars.ContextVar('current_trace', default=None)
+current_span = contextvars.ContextVar('current_span', default=None)
+
+trace_logger = logging.getLogger('bot.trace')
+trace_logger.propagate = False
+trace_logger.setLevel(logging.INFO)
+try:
+    trace_handler = logging.handlers.RotatingFileHandler(
+        TRACE_FILE, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUPS, encoding='utf-8'
+    )
+    trace_handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(trace_handler)
+except OSError as e:
+    logger.warning(f"⚠️ Не вдалося відкрити файл трасування {TRACE_FILE}: {e}")
+
+def start_trace(**attrs):
+    """Починає нове трасування в поточному контексті; повертає trace id"""
+    trace_id = uuid.uuid4().hex[:16]
+    current_trace.set({'trace_id': trace_id, **attrs})
+    current_span.set(None)
+    return trace_id
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Записує тривалість блоку як спан поточного трасування (без трасування - нічого не пише)"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    
+    span_id = uuid.uuid4().hex[:8]
+    parent_id = current_span.get()
+    token = current_span.set(span_id)
+    started_at = time.time()
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        record = {
+            'ts': round(started_at, 3),
+            'trace_id': trace['trace_id'],
+            'span_id': span_id,
+            'parent_id': parent_id,
+            'name': name,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'status': status,
+            'thread': threading.current_thread().name,
+            **{key: value for key, value in attrs.items() if value is not None},
+        }
+        trace_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+@contextlib.contextmanager
+def stage(name, site=None, **attrs):
+    """Етап обробки: спан у трасуванні та гістограма тривалості в метриках"""
+    with metrics.time_stage(name, site), span(name, site=site, **attrs):
+        yield
+
+class JobProfiler:
+    """Профілює наступні N оголошень: cProfile (потік event loop) або семплювання стеків усіх потоків"""
+    
+    def __init__(self, sample_interval):
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self.mode = None
+        self.remaining = 0
+        self.jobs = 0
+        # Номер сесії профілювання і скільки оголошень до неї вже прийнято
+        self._session = 0
+        self._admitted = 0
+        self._running = False
+        self._profile = None
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._samples = Counter()
+        self._started_at = None
+    
+    def arm(self, jobs, mode):
+        """Вмикає профілювання для наступних jobs оголошень; False, якщо вже увімкнено"""
+        with self._lock:
+            if self.mode is not None:
+                return False
+            self.mode = mode
+            self.remaining = jobs
+            self.jobs = jobs
+            self._session += 1
+            self._admitted = 0
+            return True
+    
+    def job_started(self):
+        """Запускає профайлер з першим оголошенням (викликати з потоку event loop); повертає токен для job_finished"""
+        # None - оголошення не профілюється: задачі, що стартували до /profile, не зменшують лічильник
+        with self._lock:
+            if self.mode is None or self._admitted >= self.jobs:
+                return None
+            self._admitted += 1
+            token = self._session
+            if self._running:
+                return token
+            self._running = True
+            self._started_at = time.monotonic()
+        
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._samples = Counter()
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+        logger.info(f"🔬 Профілювання {self.mode} запущено на {self.jobs} оголошень")
+        return token
+    
+    def job_finished(self, token):
+        """Рахує завершене оголошення з токеном job_started; після останнього повертає шлях до файлу профілю"""
+        with self._lock:
+            if token is None or token != self._session or not self._running:
+                return None
+            self.remaining -= 1
+            if self.remaining > 0:
+                return None
+            self._running = False
+        
+        try:
+            return self._dump()
+        finally:
+            with self._lock:
+                self.mode = None
+    
+    def _sample_loop(self):
+        """Періодично знімає стеки всіх потоків (крім власного)"""
+        own_ident = threading.get_ident()
+        while not self._stop_sampling.wait(self.sample_interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, str(ident)))
+                self._samples[';'.join(reversed(stack))] += 1
+    
+    def _dump(self):
+        """Зупиняє профайлер і записує результат у тимчасовий файл"""
+        elapsed = time.monotonic() - self._started_at
+        timestamp = time.strftime('%Y%m%d-%H%M%S')
+        
+        if self.mode == 'cprofile':
+            self._profile.disable()
+            path = Path(tempfile.gettempdir()) / f"bot-profile-{timestamp}.txt"
+            with open(path, 'w', encoding='utf-8') as report:
+                report.write(f"cProfile: {self.jobs} оголошень, {elapsed:.1f} с (лише потік event loop)\n\n")
+                stats = pstats.Stats(self._profile, stream=report)
+                stats.sort_stats('cumulative').print_stats(60)
+                stats.sort_stats('tottime').print_stats(30)
+            self._profile = None
+        else:
+            self._stop_sampling.set()
+            self._sampler.join()
+            # Формат "згорнутих стеків": підходить для flamegraph.pl і speedscope
+            path = Path(tempfile.gettempdir()) / f"bot-profile-{timestamp}.folded"
+            with open(path, 'w', encoding='utf-8') as report:
+                for stack, count in self._samples.most_common():
+                    report.write(f"{stack} {count}\n")
+            self._sampler = None
+        
+        logger.info(f"🔬 Профілювання завершено за {elapsed:.1f} с: {path}")
+        return path
+    
+    def get_stats(self):
+        with self._lock:
+            return {'mode': self.mode, 'remaining': self.remaining, 'running': self._running}
+
+# Глобальний профайлер
+job_profiler = JobProfiler(PROFILE_SAMPLE_INTERVAL)
+
+# === 🚦 JOB SCHEDULER ===
+# Поточна задача (користувач і зворотний зв'язок про чергу) для коду, що викликає планувальник
+current_job = contextvars.ContextVar('current_job', default=None)
+
+class QueueFeedback:
+    """Показує користувачу позицію в черзі, редагуючи повідомлення про обробку"""
+    
+    def __init__(self, message, text):
+        self.message = message
+        self.text = text
+        self.showing_position = False
+        self.queued = True
+        # Планувальник шле позиції окремими задачами: без блокування запізніле редагування
+        # могло б лягти після set_text і повернути рядок черги задачі, що вже працює
+        self._lock = asyncio.Lock()
+    
+    async def set_text(self, text):
+        """Змінює основний текст повідомлення; після цього позиції в черзі більше не показуються"""
+        async with self._lock:
+            self.text = text
+            self.showing_position = False
+            self.queued = False
+            await self.message.edit_text(text)
+    
+    async def on_position(self, position):
+        """Викликається планувальником: позиція в черзі або 0, коли задача стартувала"""
+        async with self._lock:
+            if not self.queued:
+                return
+            if position:
+                text = f"{self.text}\n🕒 Ваша позиція в черзі: {position}"
+                self.showing_position = True
+            elif self.showing_position:
+                text = self.text
+                self.showing_position = False
+            else:
+                return
+            
+            try:
+                await self.message.edit_text(text)
+            except Exception as e:
+                logger.warning(f"⚠️ Не вдалося оновити позицію в черзі: {e}")
+
+class JobLane:
+    """Черга задач одного типу: ліміт одночасних, чергування користувачів по колу, пріоритет адміна"""
+    
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self._priority = deque()
+        self._queues = OrderedDict()
+        self._callbacks = set()
+    
+    def waiting(self):
+        return len(self._priority) + sum(len(queue) for queue in self._queues.values())
+    
+    def _order(self):
+        """Порядок, у якому чекаючі задачі отримають слот"""
+        order = list(self._priority)
+        queues = [list(queue) for queue in self._queues.values()]
+        for i in range(max((len(queue) for queue in queues), default=0)):
+            order.extend(queue[i] for queue in queues if i < len(queue))
+        return order
+    
+    def _notify(self, waiter, position):
+        if waiter['on_position'] is None or waiter['position'] == position:
+            return
+        waiter['position'] = position
+        task = asyncio.create_task(waiter['on_position'](position))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+    
+    def _notify_positions(self):
+        for position, waiter in enumerate(self._order(), 1):
+            self._notify(waiter, position)
+    
+    def _dispatch(self):
+        """Видає вільні слоти: спершу адміну, далі по одному користувачу по колу"""
+        while self.active < self.limit:
+            if self._priority:
+                waiter = self._priority.popleft()
+            elif self._queues:
+                user_id, queue = next(iter(self._queues.items()))
+                waiter = queue.popleft()
+                del self._queues[user_id]
+                if queue:
+                    # Користувач іде в кінець кола з рештою своїх задач
+                    self._queues[user_id] = queue
+            else:
+                break
+            
+            # Скасована задача ще може бути в черзі, якщо її except ще не виконався
+            if waiter['future'].done():
+                continue
+            
+            self.active += 1
+            waiter['future'].set_result(True)
+            self._notify(waiter, 0)
+        
+        self._notify_positions()
+    
+    def _remove(self, waiter):
+        if waiter in self._priority:
+            self._priority.remove(waiter)
+            return
+        queue = self._queues.get(waiter['user_id'])
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter['user_id']]
+    
+    async def acquire(self, user_id, on_position=None):
+        """Чекає на вільний слот"""
+        if self.active < self.limit and not self.waiting():
+            self.active += 1
+            return
+        
+        waiter = {
+            'future': asyncio.get_running_loop().create_future(),
+            'user_id': user_id,
+            'on_position': on_position,
+            'position': None,
+        }
+        if user_id == ADMIN_ID:
+            self._priority.append(waiter)
+        else:
+            self._queues.setdefault(user_id, deque()).append(waiter)
+        
+        logger.info(f"🚦 Черга {self.name}: користувач {user_id} чекає ({self.waiting()} у черзі)")
+        self._notify_positions()
+        
+        try:
+            await waiter['future']
+        except asyncio.CancelledError:
+            if waiter['future'].done() and not waiter['future'].cancelled():
+                self.release()
+            else:
+                self._remove(waiter)
+                self._notify_positions()
+            raise
+    
+    def release(self):
+        """Звільняє слот і передає його наступній задачі"""
+        self.active -= 1
+        self._dispatch()
+
+class JobScheduler:
+    """Справедливий планувальник задач з окремими лімітами для Chrome і обробки фото"""
+    
+    def __init__(self, browser_limit, image_limit):
+        self.lanes = {
+            'browser': JobLane('browser', browser_limit),
+            'image': JobLane('image', image_limit),
+        }
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, lane_name):
+        """Займає слот у черзі lane_name для поточної задачі (див. current_job)"""
+        job = current_job.get() or {}
+        lane = self.lanes[lane_name]
+        await lane.acquire(job.get('user_id'), job.get('on_position'))
+        try:
+            yield
+        finally:
+            lane.release()
+    
+    def get_stats(self):
+        """Повертає кількість активних і чекаючих задач по чергах"""
+        return {
+            name: {'active': lane.active, 'limit': lane.limit, 'waiting': lane.waiting()}
+            for name, lane in self.lanes.items()
+        }
+
+# Глобальний планувальник задач
+job_scheduler = JobScheduler(BROWSER_JOB_LIMIT, IMAGE_JOB_LIMIT)
+
+class DriverPool:
+    """Пул прогрітих Chrome WebDriver, які перевикористовуються між запитами"""
+    
+    def __init__(self, factory, min_size, max_size, max_uses):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_uses = max_uses
+        self._cond = threading.Condition()
+        self._idle = []
+        self._uses = {}
+        self._alive = 0
+        self._closed = False
+        self.created = 0
+        self.recycled = 0
+    
+    def _is_healthy(self, driver):
+        """Перевіряє, що браузер ще відповідає"""
+        try:
+            return driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+    
+    def _quit(self, driver):
+        """Закриває браузер і звільняє місце в пулі"""
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ Помилка закриття Chrome: {e}")
+        with self._cond:
+            self._uses.pop(driver, None)
+            self._alive -= 1
+            self.recycled += 1
+            self._cond.notify()
+    
+    def _create(self):
+        """Запускає новий Chrome (місце в пулі вже зарезервоване)"""
+        driver = None
+        try:
+            driver = self.factory()
+        finally:
+            with self._cond:
+                if driver is None:
+                    self._alive -= 1
+                    self._cond.notify()
+                else:
+                    self._uses[driver] = 0
+                    self.created += 1
+        if driver is None:
+            raise RuntimeError("Не вдалося запустити Chrome")
+        return driver
+    
+    def acquire(self):
+        """Видає здоровий браузер з пулу, за потреби запускаючи новий"""
+        while True:
+            with self._cond:
+                while not self._idle and self._alive >= self.max_size:
+                    self._cond.wait()
+                if self._closed:
+                    raise RuntimeError("Пул Chrome закрито")
+                if self._idle:
+                    driver = self._idle.pop()
+                else:
+                    self._alive += 1
+                    driver = None
+            
+            if driver is None:
+                return self._create()
+            
+            if self._is_healthy(driver):
+                return driver
+            
+            logger.warning("⚠️ Chrome не пройшов перевірку, перезапускаю")
+            self._quit(driver)
+    
+    def release(self, driver, broken=False):
+        """Повертає браузер у пул або перезапускає його після помилки чи N використань"""
+        with self._cond:
+            self._uses[driver] = self._uses.get(driver, 0) + 1
+            uses = self._uses[driver]
+            closed = self._closed
+        
+        if broken or closed or uses >= self.max_uses:
+            logger.info(f"♻️ Перезапуск Chrome (використань: {uses}, помилка: {broken})")
+            self._quit(driver)
+            if not closed:
+                threading.Thread(target=self.warm_up, daemon=True).start()
+            return
+        
+        try:
+            # Звільняємо пам'ять сторінки, cookies (згода на cookie) залишаємо
+            driver.get("about:blank")
+        except Exception:
+            self._quit(driver)
+            return
+        
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+    
+    def warm_up(self):
+        """Запускає мінімальну кількість браузерів заздалегідь"""
+        while True:
+            with self._cond:
+                if self._closed or self._alive >= self.min_size:
+                    return
+                self._alive += 1
+            try:
+                driver = self._create()
+            except Exception as e:
+                logger.error(f"❌ Не вдалося прогріти пул Chrome: {e}")
+                return
+            with self._cond:
+                self._idle.append(driver)
+                self._cond.notify()
+            logger.info("🔥 Chrome прогріто")
+    
+    def close_all(self):
+        """Закриває всі вільні браузери; зайняті закриються при поверненні"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+        logger.info("🔚 Пул Chrome закрито")
+    
+    def reopen(self):
+        """Дозволяє знову видавати браузери після close_all"""
+        with self._cond:
+            self._closed = False
+    
+    def get_stats(self):
+        """Повертає поточний стан пулу"""
+        with self._cond:
+            return {
+                'alive': self._alive,
+                'idle': len(self._idle),
+                'max': self.max_size,
+                'created': self.created,
+                'recycled': self.recycled,
+            }
+
+class BrowserWaits:
+    """Очікування умов у DOM замість фіксованих пауз, з обліком фактичного часу"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}
+    
+    def _record(self, step, elapsed, satisfied):
+        """Зберігає фактичну тривалість очікування кроку"""
+        with self._lock:
+            timing = self.timings.setdefault(step, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            timing['count'] += 1
+            timing['total'] += elapsed
+            timing['max'] = max(timing['max'], elapsed)
+            if not satisfied:
+                timing['timeouts'] += 1
+    
+    def until(self, driver, step, condition):
+        """Чекає, поки condition(driver) стане істинною, але не довше за ліміт кроку"""
+        timeout = WAIT_TIMEOUTS[step]
+        started_at = time.monotonic()
+        satisfied = False
+        try:
+            WebDriverWait(
+                driver, timeout, poll_frequency=WAIT_POLL_INTERVAL,
+                ignored_exceptions=(NoSuchElementException, StaleElementReferenceException, JavascriptException)
+            ).until(condition)
+            satisfied = True
+        except TimeoutException:
+            logger.info(f"⏳ {step}: умова не виконалась за {timeout}с")
+        
+        elapsed = time.monotonic() - started_at
+        self._record(step, elapsed, satisfied)
+        logger.info(f"⏱️ Очікування {step}: {elapsed:.2f}с")
+        return satisfied
+    
+    def page_ready(self, driver):
+        """Чекає на завантаження документа"""
+        return self.until(
+            driver, 'page_ready',
+            lambda d: d.execute_script("return document.readyState;") in ('interactive', 'complete')
+        )
+    
+    def network_idle(self, driver):
+        """Чекає, поки сторінка перестане робити нові мережеві запити"""
+        state = {'count': -1, 'since': time.monotonic()}
+        
+        def condition(d):
+            count = d.execute_script("return performance.getEntriesByType('resource').length;")
+            now = time.monotonic()
+            if count != state['count']:
+                state['count'] = count
+                state['since'] = now
+                return False
+            return now - state['since'] >= NETWORK_IDLE_WINDOW
+        
+        return self.until(driver, 'network_idle', condition)
+    
+    def url_changed_or_dialog(self, driver, previous_url):
+        """Чекає на перехід на іншу сторінку або появу діалогу галереї"""
+        return self.until(
+            driver, 'photos_button',
+            lambda d: d.current_url != previous_url or self._dialog_displayed(d)
+        )
+    
+    def gallery_images(self, driver):
+        """Чекає на появу фото з CDN на сторінці галереї"""
+        return self.until(
+            driver, 'gallery_images',
+            lambda d: d.execute_script("""
+                return document.querySelectorAll(
+                    'img[src*="apollo.olxcdn.com"], img[data-src*="apollo.olxcdn.com"]'
+                ).length > 0;
+            """)
+        )
+    
+    def _dialog_displayed(self, driver):
+        return driver.execute_script("""
+            var selectors = [
+                'div[role="dialog"]',
+                'div[data-testid="photo-modal"]',
+                'div[class*="modal"]'
+            ];
+            for (var selector of selectors) {
+                var element = document.querySelector(selector);
+                if (element && element.offsetParent !== null) {
+                    return true;
+                }
+            }
+            return false;
+        """)
+    
+    def gallery_open(self, driver):
+        """Чекає, поки діалог галереї стане видимим"""
+        return self.until(driver, 'gallery_open', self._dialog_displayed)
+    
+    def active_image_src(self, driver):
+        """Повертає src активного фото в галереї"""
+        try:
+            return driver.execute_script("""
+                var img = document.querySelector(
+                    'div[role="dialog"] .swiper-slide-active img, ' +
+                    'div[data-testid="photo-modal"] img, ' +
+                    'div[role="dialog"] img'
+                );
+                return img ? (img.currentSrc || img.src || img.getAttribute('data-src')) : null;
+            """)
+        except Exception:
+            return None
+    
+    def next_photo(self, driver, previous_src):
+        """Чекає, поки в галереї з'явиться нове фото"""
+        return self.until(
+            driver, 'next_photo',
+            lambda d: self.active_image_src(d) not in (None, previous_src)
+        )
+    
+    def get_stats(self):
+        """Повертає статистику очікувань по кроках"""
+        with self._lock:
+            return {step: dict(timing) for step, timing in self.timings.items()}
+
+# === 🖼️ IMAGE PROCESSING ===
+class PerceptualDeduplicator:
+    """Відкидає майже однакові фото за відстанню Геммінга між їх dHash"""
+    
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self._hashes = np.empty(0, dtype='>u8')
+    
+    def remember(self, image_hash):
+        """Запам'ятовує хеш уже відправленого фото без перевірки"""
+        self._hashes = np.concatenate([self._hashes, np.array([int(image_hash, 16)], dtype='>u8')])
+    
+    def seen_similar(self, image_hash):
+        """Повертає True для майже дубліката; інакше запам'ятовує хеш і повертає False"""
+        value = np.array([int(image_hash, 16)], dtype='>u8')
+        if len(self._hashes):
+            xor = np.bitwise_xor(self._hashes, value)
+            distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            if distances.min() <= self.threshold:
+                return True
+        self._hashes = np.concatenate([self._hashes, value])
+        return False
+
+class ImageProcessor:
+    """Виконує CPU-важку обробку фото в пулі процесів, щоб не блокувати event loop"""
+    
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+    
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn замість fork: у батьківському процесі вже працюють потоки
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+    
+    async def process(self, image_data, remove_watermark):
+        """Повертає dict з width, height, hash та JPEG-байтами (data=None для замалих фото)"""
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), image_pipeline.process_image_in_worker, image_data, remove_watermark
+            )
+        except BrokenProcessPool:
+            logger.error("❌ Пул обробки фото зламався, буде створено новий")
+            self._executor = None
+            raise
+        
+        if result['passthrough']:
+            result['data'] = image_data
+        return result
+    
+    def shutdown(self, wait=False):
+        """Зупиняє процеси обробки"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+# Глобальний обробник фото
+image_processor = ImageProcessor(IMAGE_WORKERS)
+
+def image_profile(is_olx):
+    """Назва обробки, яку проходить фото (впливає на ключі кешів)"""
+    profile = 'olx_raw' if is_olx else 'otodom_crop'
+    return f"{profile}_{TARGET_LONG_EDGE}"
+
+def photo_cache_key(photo_url, is_olx):
+    """Ключ кешу: канонічний ID фото + профіль обробки"""
+    photo_id_match = re.search(r'/files/([^/]+)', photo_url)
+    photo_id = photo_id_match.group(1) if photo_id_match else photo_url
+    return f"{photo_id}:{image_profile(is_olx)}"
+
+# === 💾 CACHES ===
+class FileIdCache:
+    """Постійний кеш Telegram file_id уже відправлених фото (SQLite)"""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+    
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS photo_file_ids ("
+                "photo_key TEXT PRIMARY KEY, file_id TEXT NOT NULL, updated_at REAL NOT NULL, image_hash TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(photo_file_ids)")}
+            if 'image_hash' not in columns:
+                self._conn.execute("ALTER TABLE photo_file_ids ADD COLUMN image_hash TEXT")
+            self._conn.commit()
+        return self._conn
+    
+    def get_many(self, keys):
+        """Повертає {ключ: (file_id, dHash)} для ключів, що є в кеші"""
+        if not keys:
+            return {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                placeholders = ','.join('?' for _ in keys)
+                # Записи без dHash (зі старої схеми) - промах: без хешу фото не потрапить у дедуплікатор
+                rows = conn.execute(
+                    f"SELECT photo_key, file_id, image_hash FROM photo_file_ids "
+                    f"WHERE photo_key IN ({placeholders}) AND image_hash IS NOT NULL",
+                    list(keys)
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"❌ Помилка читання кешу file_id: {e}")
+            return {}
+        
+        found = {key: (file_id, image_hash) for key, file_id, image_hash in rows}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+    
+    def put_many(self, items):
+        """Зберігає трійки (ключ, file_id, dHash)"""
+        if not items:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO photo_file_ids (photo_key, file_id, updated_at, image_hash) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(key, file_id, now, image_hash) for key, file_id, image_hash in items]
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Помилка запису кешу file_id: {e}")
+    
+    def invalidate_many(self, keys):
+        """Видаляє file_id, які Telegram більше не приймає"""
+        if not keys:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("DELETE FROM photo_file_ids WHERE photo_key = ?", [(key,) for key in keys])
+                conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Помилка очищення кешу file_id: {e}")
+    
+    def get_stats(self):
+        """Повертає кількість влучань і промахів"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+# Глобальний кеш file_id
+file_id_cache = FileIdCache(CACHE_DB)
+
+def extract_listing_urls(text):
+    """Знаходить посилання на оголошення в тексті без кінцевих розділових знаків"""
+    return [url.rstrip(LISTING_URL_TRAILING) for url in LISTING_URL_PATTERN.findall(text)]
+
+def normalize_listing_url(url):
+    """Канонічний URL оголошення: без www, фрагмента, трекінгових параметрів і кінцевого /"""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in TRACKING_QUERY_PARAMS
+    ]
+    
+    return urlunparse(('https', host, parsed.path.rstrip('/'), '', urlencode(query), ''))
+
+class ListingCache:
+    """LRU-кеш списків фото оголошень з TTL і збереженням у SQLite між перезапусками"""
+    
+    def __init__(self, db_path, ttl, max_size):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = None
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS listing_photos ("
+                "listing_url TEXT PRIMARY KEY, photo_urls TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+    
+    def get(self, url):
+        """Повертає список фото або None, якщо запису немає чи він застарів"""
+        key = normalize_listing_url(url)
+        now = time.time()
+        try:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is None:
+                    row = self._connect().execute(
+                        "SELECT photo_urls, created_at FROM listing_photos WHERE listing_url = ?", (key,)
+                    ).fetchone()
+                    if row:
+                        entry = (json.loads(row[0]), row[1])
+                
+                if entry is None or now - entry[1] > self.ttl:
+                    if entry is not None:
+                        self._delete(key)
+                    self.misses += 1
+                    return None
+                
+                self._memory[key] = entry
+                self._memory.move_to_end(key)
+                self._trim_memory()
+                self._connect().execute(
+                    "UPDATE listing_photos SET accessed_at = ? WHERE listing_url = ?", (now, key)
+                )
+                self._conn.commit()
+                self.hits += 1
+                return list(entry[0])
+        except Exception as e:
+            logger.error(f"❌ Помилка читання кешу оголошень: {e}")
+            return None
+    
+    def put(self, url, photo_urls):
+        """Зберігає список фото оголошення"""
+        if not photo_urls:
+            return
+        key = normalize_listing_url(url)
+        now = time.time()
+        try:
+            with self._lock:
+                self._memory[key] = (list(photo_urls), now)
+                self._memory.move_to_end(key)
+                self._trim_memory()
+                
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO listing_photos (listing_url, photo_urls, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(photo_urls), now, now)
+                )
+                conn.execute("DELETE FROM listing_photos WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM listing_photos WHERE listing_url NOT IN ("
+                    "SELECT listing_url FROM listing_photos ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_size,)
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Помилка запису кешу оголошень: {e}")
+    
+    def invalidate(self, url):
+        """Видаляє оголошення з кешу; повертає True, якщо запис був"""
+        key = normalize_listing_url(url)
+        with self._lock:
+            in_memory = self._memory.pop(key, None) is not None
+            return self._delete(key) or in_memory
+    
+    def _delete(self, key):
+        self._memory.pop(key, None)
+        cursor = self._connect().execute("DELETE FROM listing_photos WHERE listing_url = ?", (key,))
+        self._conn.commit()
+        return cursor.rowcount > 0
+    
+    def _trim_memory(self):
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+    
+    def get_stats(self):
+        """Повертає кількість влучань, промахів і записів у пам'яті"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._memory)}
+
+# Глобальний кеш оголошень
+listing_cache = ListingCache(CACHE_DB, LISTING_CACHE_TTL, LISTING_CACHE_SIZE)
+
+class ImageDiskCache:
+    """Кеш оброблених JPEG на диску з адресою за ID фото і профілем та LRU в межах бюджету байтів"""
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def _digest(self, cache_key):
+        return hashlib.sha256(cache_key.encode('utf-8')).hexdigest()[:40]
+    
+    def _load_index(self):
+        """Будує LRU-індекс з файлів каталогу (порядок за часом останнього доступу)"""
+        if self._index is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                os.unlink(entry.path)
+                continue
+            # Ім'я файлу: <digest>.<width>x<height>.<hash>.jpg
+            parts = entry.name.split('.')
+            if len(parts) != 4 or parts[3] != 'jpg':
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, parts[0], entry.name, stat.st_size))
+        
+        self._index = OrderedDict()
+        self.total_bytes = 0
+        for _, digest, filename, size in sorted(entries):
+            self._index[digest] = (filename, size)
+            self.total_bytes += size
+    
+    def get(self, cache_key):
+        """Повертає dict з data, width, height та hash або None (читає файл, тому викликати з потоку)"""
+        try:
+            with self._lock:
+                self._load_index()
+                digest = self._digest(cache_key)
+                entry = self._index.get(digest)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                
+                filename, size = entry
+                path = self.directory / filename
+                os.utime(path)
+                self._index.move_to_end(digest)
+                self.hits += 1
+            # Читаємо поза блокуванням; файл могли витіснити між індексом і читанням
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                if self._index.pop(digest, None) is not None:
+                    self.total_bytes -= size
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.error(f"❌ Помилка читання дискового кешу: {e}")
+            return None
+        
+        _, dimensions, image_hash, _ = filename.split('.')
+        width, height = (int(value) for value in dimensions.split('x'))
+        return {'data': data, 'width': width, 'height': height, 'hash': image_hash}
+    
+    def put(self, cache_key, data, width, height, image_hash):
+        """Атомарно записує оброблене фото і витісняє найдавніші записи понад бюджет"""
+        try:
+            with self._lock:
+                self._load_index()
+            
+            digest = self._digest(cache_key)
+            filename = f"{digest}.{width}x{height}.{image_hash}.jpg"
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.directory / filename)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            
+            with self._lock:
+                previous = self._index.pop(digest, None)
+                if previous:
+                    self.total_bytes -= previous[1]
+                    if previous[0] != filename:
+                        (self.directory / previous[0]).unlink(missing_ok=True)
+                self._index[digest] = (filename, len(data))
+                self.total_bytes += len(data)
+                
+                while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                    _, (old_filename, old_size) = self._index.popitem(last=False)
+                    (self.directory / old_filename).unlink(missing_ok=True)
+                    self.total_bytes -= old_size
+        except Exception as e:
+            logger.error(f"❌ Помилка запису дискового кешу: {e}")
+    
+    def get_stats(self):
+        """Повертає кількість влучань, промахів і зайняті байти"""
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self.total_bytes}
+
+# Глобальний дисковий кеш фото
+image_disk_cache = ImageDiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
 class FixedGalleryExtractor:
     def __init__(self):
         self.photo_domains = [
             'ireland.apollo.olxcdn.com',
             'otodom-tech.imgix.net'
         ]
+        self.driver_pool = DriverPool(self.setup_driver, DRIVER_POOL_MIN, DRIVER_POOL_MAX, DRIVER_MAX_USES)
+        self.waits = BrowserWaits()
         
     def setup_driver(self):
         """Налаштовує Chrome WebDriver для Railway"""
@@ -225,13 +1645,18 @@ class FixedGalleryExtractor:
             options.add_argument('--no-sandbox')
             options.add_argument('--disable-dev-shm-usage')
             options.add_argument('--disable-gpu')
-            options.add_argument('--remote-debugging-port=9222')
             options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
             
+            options.page_load_strategy = PAGE_LOAD_STRATEGY
+            
             # Для Railway
             options.binary_location = "/usr/bin/google-chrome-stable"
             
-            driver = webdriver.Chrome(options=options)
+            with stage('setup_driver'):
+                driver = webdriver.Chrome(options=options)
+                if BLOCK_PAGE_RESOURCES:
+                    # Network.setBlockedURLs працює лише з увімкненим доменом Network
+                    driver.execute_cdp_cmd('Network.enable', {})
             logger.info("✅ Chrome успішно ініціалізовано")
             return driver
             
@@ -239,27 +1664,20 @@ class FixedGalleryExtractor:
             logger.error(f"❌ Помилка ініціалізації Chrome: {e}")
             return None
 
-    def remove_watermark(self, image):
-        """Видаляє водяний знак (тільки для Otodom)"""
+    def block_page_resources(self, driver, site):
+        """Задає шаблони заблокованих URL для сайту (браузери з пулу переходять між сайтами)"""
+        if not BLOCK_PAGE_RESOURCES:
+            return
+        patterns = BLOCKED_URL_PATTERNS.get(site, [])
         try:
-            width, height = image.size
-            logger.info(f"📐 Оригінальний розмір: {width}x{height}")
-            
-            if height > 800:
-                crop_height = int(height * 0.92)
-            elif height > 600:
-                crop_height = int(height * 0.90)
-            elif height > 400:
-                crop_height = int(height * 0.88)
-            else:
-                crop_height = int(height * 0.85)
-            
-            cropped_image = image.crop((0, 0, width, crop_height))
-            logger.info(f"📏 Обрізано: {width}x{height} -> {width}x{crop_height}")
-            return cropped_image
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.info(f"🚫 Блокую {len(patterns)} типів ресурсів для {site}")
         except Exception as e:
-            logger.error(f"❌ Помилка обрізки: {e}")
-            return image
+            logger.warning(f"⚠️ Не вдалося налаштувати блокування ресурсів: {e}")
+
+    def remove_watermark(self, image):
+        """Видаляє водяний знак (тільки для Otodom)"""
+        return crop_watermark(image)
 
     async def download_image(self, url, session):
         """Завантаження зображення з URL"""
@@ -278,15 +1696,8 @@ class FixedGalleryExtractor:
                     logger.info(f"📊 Розмір файлу: {len(image_data)} байт")
                     
                     if len(image_data) > 1000:
-                        try:
-                            image = Image.open(BytesIO(image_data))
-                            if image.mode in ('RGBA', 'P'):
-                                image = image.convert('RGB')
-                            logger.info("✅ Успішно завантажено")
-                            return image
-                        except Exception as e:
-                            logger.error(f"❌ Помилка відкриття зображення: {e}")
-                            return None
+                        logger.info("✅ Успішно завантажено")
+                        return image_data
                     else:
                         logger.warning(f"⚠️ Занадто малий файл: {len(image_data)} байт")
                         return None
@@ -297,6 +1708,126 @@ class FixedGalleryExtractor:
             logger.error(f"❌ Помилка завантаження: {e}")
             return None
 
+    async def fetch_listing_html(self, url, session):
+        """Завантажує HTML сторінки оголошення звичайним HTTP-запитом"""
+        try:
+            headers = {
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "pl-PL,pl;q=0.9,en;q=0.8",
+            }
+            
+            timeout = aiohttp.ClientTimeout(total=HTML_TIMEOUT)
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.warning(f"⚠️ HTML недоступний: HTTP {response.status} для {url}")
+                    return None
+                html = await response.text()
+                logger.info(f"📄 HTML завантажено: {len(html)} символів")
+                return html
+        except Exception as e:
+            logger.error(f"❌ Помилка завантаження HTML: {e}")
+            return None
+
+    def unique_by_photo_id(self, urls):
+        """Прибирає дублікати URL за ID фото, зберігаючи порядок"""
+        seen_ids = set()
+        unique_urls = []
+        for url in urls:
+            photo_id_match = re.search(r'/files/([^/]+)', url)
+            photo_id = photo_id_match.group(1) if photo_id_match else url
+            if photo_id not in seen_ids:
+                seen_ids.add(photo_id)
+                unique_urls.append(url)
+        return unique_urls
+
+    def parse_otodom_listing_json(self, html):
+        """Витягує повнорозмірні URL фото з вбудованого JSON (__NEXT_DATA__) сторінки Otodom"""
+        try:
+            match = re.search(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.S)
+            if not match:
+                logger.warning("⚠️ __NEXT_DATA__ не знайдено на сторінці Otodom")
+                return []
+            
+            data = json.loads(match.group(1))
+            ad = data.get('props', {}).get('pageProps', {}).get('ad') or {}
+            images = ad.get('images') or []
+            
+            photo_urls = []
+            for image in images:
+                if isinstance(image, dict):
+                    src = image.get('large') or image.get('medium') or image.get('small')
+                else:
+                    src = image
+                if isinstance(src, str) and 'apollo.olxcdn.com' in src:
+                    photo_urls.append(src.strip())
+            
+            photo_urls = self.unique_by_photo_id(photo_urls)
+            logger.info(f"🧩 З JSON Otodom отримано {len(photo_urls)} фото")
+            return photo_urls
+            
+        except Exception as e:
+            logger.error(f"❌ Помилка розбору JSON Otodom: {e}")
+            return []
+
+    async def extract_otodom_photos_http(self, url, session):
+        """Швидкий шлях Otodom: фото з HTML без запуску Chrome"""
+        html = await self.fetch_listing_html(url, session)
+        if not html:
+            return []
+        photo_urls = self.parse_otodom_listing_json(html)
+        return [self.get_high_quality_url(photo_url) for photo_url in photo_urls]
+
+    def normalize_olx_photo_url(self, src):
+        """Нормалізує URL фото OLX так само, як JS у браузерному шляху"""
+        clean_url = re.sub(r'\s', '', src)
+        
+        if ';s=' in clean_url:
+            clean_url = clean_url.split(';s=')[0]
+        if ';t=' in clean_url:
+            clean_url = clean_url.split(';t=')[0]
+        
+        if 'width=' not in clean_url:
+            clean_url += '?width=1200&quality=80'
+        
+        return clean_url
+
+    def parse_olx_prerendered_state(self, html):
+        """Витягує URL фото з window.__PRERENDERED_STATE__ сторінки OLX"""
+        try:
+            match = re.search(r'window\.__PRERENDERED_STATE__\s*=\s*("(?:[^"\\]|\\.)*")', html)
+            if not match:
+                logger.warning("⚠️ __PRERENDERED_STATE__ не знайдено на сторінці OLX")
+                return []
+            
+            # Стан записано як JSON-рядок, що містить JSON
+            state = json.loads(json.loads(match.group(1)))
+            photos = state.get('ad', {}).get('ad', {}).get('photos') or []
+            
+            photo_urls = []
+            for photo in photos:
+                if isinstance(photo, dict):
+                    src = photo.get('link') or photo.get('url')
+                else:
+                    src = photo
+                if isinstance(src, str) and ('apollo.olxcdn.com' in src or 'olx.ua' in src):
+                    photo_urls.append(self.normalize_olx_photo_url(src))
+            
+            photo_urls = self.unique_by_photo_id(photo_urls)
+            logger.info(f"🧩 Зі стану OLX отримано {len(photo_urls)} фото")
+            return photo_urls
+            
+        except Exception as e:
+            logger.error(f"❌ Помилка розбору стану OLX: {e}")
+            return []
+
+    async def extract_olx_photos_http(self, url, session):
+        """Швидкий шлях OLX: фото з HTML без запуску Chrome"""
+        html = await self.fetch_listing_html(url, session)
+        if not html:
+            return []
+        return self.parse_olx_prerendered_state(html)
+
     def find_and_click_photos_button(self, driver):
         """Знаходить і клікає на кнопку 'zdjecia' (для Otodom)"""
         try:
@@ -336,9 +1867,10 @@ class FixedGalleryExtractor:
             
             if button_info:
                 logger.info(f"✅ Знайдено кнопку: {button_info['text']}")
+                previous_url = driver.current_url
                 driver.execute_script("arguments[0].click();", button_info['element'])
                 logger.info("🖱️ Клікнув на кнопку")
-                time.sleep(5)
+                self.waits.url_changed_or_dialog(driver, previous_url)
                 return True
             else:
                 logger.warning("❌ Кнопку не знайдено")
@@ -438,11 +1970,10 @@ class FixedGalleryExtractor:
                         logger.info(f"📸 URL фото: {src[:100]}...")
                         
                         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", main_image)
-                        time.sleep(1)
                         
                         driver.execute_script("arguments[0].click();", main_image)
                         logger.info("🖱️ Клікнув на головне фото через JavaScript")
-                        time.sleep(3)
+                        self.waits.gallery_open(driver)
                         
                         gallery_selectors = [
                             'div[role="dialog"]',
@@ -486,7 +2017,7 @@ class FixedGalleryExtractor:
                             rect.top >= 0 && rect.left >= 0 &&
                             img.offsetParent !== null) {
                             
-                            img.scrollIntoView({behavior: 'smooth', block: 'center'});
+                            img.scrollIntoView({block: 'center'});
                             img.click();
                             console.log('Клікнув на фото з селектором: ' + selector);
                             return true;
@@ -498,7 +2029,7 @@ class FixedGalleryExtractor:
             
             if click_success:
                 logger.info("✅ Клікнув на фото через JavaScript")
-                time.sleep(3)
+                self.waits.gallery_open(driver)
                 return True
             
             logger.info("🎯 Спроба кліку по координатах...")
@@ -514,7 +2045,7 @@ class FixedGalleryExtractor:
                         actions = ActionChains(driver)
                         actions.move_to_element(img).click().perform()
                         logger.info(f"🖱️ Клікнув по координатах: ({x}, {y})")
-                        time.sleep(3)
+                        self.waits.gallery_open(driver)
                         return True
                 except:
                     continue
@@ -558,7 +2089,6 @@ class FixedGalleryExtractor:
                     logger.info(f"✅ Знайдено кнопку наступний: {selector}")
                     
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
-                    time.sleep(0.5)
                     
                     driver.execute_script("arguments[0].click();", next_button)
                     logger.info("🖱️ Клікнув на кнопку наступний через JavaScript")
@@ -598,72 +2128,169 @@ class FixedGalleryExtractor:
                     }
                 }
                 
-                return false;
+                return false;
+            """)
+            
+            if next_clicked:
+                logger.info("✅ Клікнув наступний через JavaScript")
+                return True
+                
+            logger.info("⌨️ Спроба кліку правою стрілкою...")
+            actions = ActionChains(driver)
+            actions.send_keys(Keys.ARROW_RIGHT).perform()
+            logger.info("✅ Натиснув праву стрілку")
+            return True
+                
+        except Exception as e:
+            logger.error(f"❌ Помилка кліку на кнопку наступний: {e}")
+            return False
+
+    def harvest_olx_gallery_slides(self, driver):
+        """Збирає URL усіх слайдів відкритої галереї OLX за одне виконання скрипту"""
+        try:
+            result = driver.execute_script("""
+                // Без відкритої галереї не збираємо нічого: на сторінці є мініатюри інших оголошень
+                var root = document.querySelector('div[data-testid="photo-modal"]') ||
+                           document.querySelector('div[role="dialog"]');
+                if (!root) {
+                    return {sources: [], total: null};
+                }
+                var sources = [];
+                
+                var images = root.querySelectorAll('div[class*="swiper-slide"] img, img');
+                for (var img of images) {
+                    var slide = img.closest('div[class*="swiper-slide"]');
+                    if (slide && slide.className.includes('swiper-slide-duplicate')) {
+                        continue;
+                    }
+                    var candidates = [
+                        img.getAttribute('data-src'),
+                        img.dataset ? img.dataset.src : null,
+                        img.currentSrc,
+                        img.src
+                    ];
+                    var srcset = img.getAttribute('srcset') || img.getAttribute('data-srcset');
+                    if (srcset) {
+                        var parts = srcset.split(',');
+                        candidates.push(parts[parts.length - 1].trim().split(' ')[0]);
+                    }
+                    for (var src of candidates) {
+                        if (src) {
+                            sources.push(src);
+                        }
+                    }
+                }
+                
+                // Кількість слайдів - лише з лічильника самої галереї, а не з тексту оголошення (поверх "3/10")
+                var total = null;
+                var counterElement = root.querySelector(
+                    '.swiper-pagination-fraction, [data-testid*="counter"], [class*="counter"]'
+                );
+                var counter = counterElement ? (counterElement.textContent || '').match(/^\\s*(\\d+)\\s*\\/\\s*(\\d+)\\s*$/) : null;
+                if (counter) {
+                    total = parseInt(counter[2], 10);
+                }
+                if (!total) {
+                    var swiperElement = root.querySelector('.swiper, .swiper-container');
+                    if (swiperElement && swiperElement.swiper && swiperElement.swiper.slides) {
+                        total = Array.from(swiperElement.swiper.slides).filter(function (slide) {
+                            return !slide.className.includes('swiper-slide-duplicate');
+                        }).length;
+                    }
+                }
+                if (!total) {
+                    var slides = root.querySelectorAll(
+                        'div[class*="swiper-slide"]:not([class*="swiper-slide-duplicate"])'
+                    );
+                    total = slides.length || null;
+                }
+                
+                return {sources: sources, total: total};
             """)
             
-            if next_clicked:
-                logger.info("✅ Клікнув наступний через JavaScript")
-                return True
-                
-            logger.info("⌨️ Спроба кліку правою стрілкою...")
-            actions = ActionChains(driver)
-            actions.send_keys(Keys.ARROW_RIGHT).perform()
-            logger.info("✅ Натиснув праву стрілку")
-            return True
-                
+            photo_urls = [
+                self.normalize_olx_photo_url(src) for src in result['sources']
+                if 'apollo.olxcdn.com' in src or 'olx.ua' in src
+            ]
+            photo_urls = self.unique_by_photo_id(photo_urls)
+            total = result['total']
+            logger.info(f"🧺 За один прохід зібрано {len(photo_urls)} фото, слайдів у галереї: {total or 'невідомо'}")
+            return photo_urls, total
+            
         except Exception as e:
-            logger.error(f"❌ Помилка кліку на кнопку наступний: {e}")
-            return False
+            logger.error(f"❌ Помилка збору слайдів галереї OLX: {e}")
+            return [], None
 
     def navigate_olx_gallery(self, driver):
-        """Гортає фото в галереї OLX і збирає всі URL"""
+        """Збирає всі URL галереї OLX, гортаючи лише до відсутніх слайдів"""
+        all_photo_urls = {}
+        
+        def add_photos(photo_urls):
+            added = 0
+            for photo_url in photo_urls:
+                photo_id_match = re.search(r'/files/([^/]+)', photo_url)
+                photo_id = photo_id_match.group(1) if photo_id_match else photo_url
+                if photo_id not in all_photo_urls:
+                    all_photo_urls[photo_id] = photo_url
+                    added += 1
+            return added
+        
         try:
-            logger.info("🔄 Гортання галереї OLX...")
+            logger.info("🔄 Збір фото з галереї OLX...")
             
-            all_photo_urls = set()
-            max_photos = 30
+            with span('harvest_olx_gallery_slides'):
+                harvested, total_slides = self.harvest_olx_gallery_slides(driver)
+                add_photos(harvested)
+            
+            if total_slides and len(all_photo_urls) >= total_slides:
+                logger.info(f"🎯 Усі {total_slides} слайдів зібрано без гортання")
+                return list(all_photo_urls.values())
+            
+            # Гортаємо лише для слайдів, яких немає в DOM; зупиняємось на відомій кількості
+            max_steps = total_slides or 30
             current_attempt = 0
             consecutive_failures = 0
             
-            while current_attempt < max_photos and consecutive_failures < 5:
+            while current_attempt < max_steps and consecutive_failures < 5:
+                if total_slides and len(all_photo_urls) >= total_slides:
+                    logger.info(f"✅ Зібрано всі {total_slides} слайдів")
+                    break
+                
                 current_attempt += 1
                 logger.info(f"📖 Сторінка {current_attempt}")
                 
-                current_photos = self.extract_current_olx_gallery_photos(driver)
-                initial_count = len(all_photo_urls)
-                
-                for photo_url in current_photos:
-                    all_photo_urls.add(photo_url)
-                
-                new_photos_count = len(all_photo_urls) - initial_count
-                logger.info(f"📸 Нових фото на цій сторінці: {new_photos_count}")
-                
-                if new_photos_count > 0:
-                    consecutive_failures = 0
-                else:
-                    consecutive_failures += 1
-                
-                next_success = self.click_olx_next_button(driver)
-                
-                if not next_success:
-                    logger.info("❌ Не вдалося знайти кнопку 'наступний'")
-                    consecutive_failures += 1
-                    if consecutive_failures >= 3:
-                        logger.info("🚫 Забагато послідовних помилок, зупиняюся")
-                        break
-                
-                time.sleep(2)
+                with span('navigate_olx_gallery_page', page=current_attempt):
+                    new_photos_count = add_photos(self.extract_current_olx_gallery_photos(driver))
+                    logger.info(f"📸 Нових фото на цій сторінці: {new_photos_count}")
+                    
+                    if new_photos_count > 0:
+                        consecutive_failures = 0
+                    else:
+                        consecutive_failures += 1
+                    
+                    if total_slides and len(all_photo_urls) >= total_slides:
+                        continue
+                    
+                    previous_src = self.waits.active_image_src(driver)
+                    next_success = self.click_olx_next_button(driver)
+                    
+                    if not next_success:
+                        logger.info("❌ Не вдалося знайти кнопку 'наступний'")
+                        consecutive_failures += 1
+                    else:
+                        self.waits.next_photo(driver, previous_src)
                 
-                if consecutive_failures >= 3:
+                # Без відомої кількості слайдів покладаємось на лічильник невдач
+                if not total_slides and consecutive_failures >= 3:
                     logger.info("🚫 Більше нових фото не знайдено, зупиняюся")
                     break
             
             logger.info(f"🎯 Всього зібрано {len(all_photo_urls)} унікальних фото")
-            return list(all_photo_urls)
+            return list(all_photo_urls.values())
             
         except Exception as e:
             logger.error(f"❌ Помилка гортання галереї OLX: {e}")
-            return list(all_photo_urls)
+            return list(all_photo_urls.values())
 
     def extract_current_olx_gallery_photos(self, driver):
         """Витягує фото з поточної сторінки галереї OLX"""
@@ -847,29 +2474,33 @@ class FixedGalleryExtractor:
     def extract_photos_via_gallery(self, url):
         """Основний метод через сторінку галереї (Otodom)"""
         driver = None
+        broken = False
         try:
             logger.info(f"🚀 Запуск пошуку для Otodom: {url}")
-            driver = self.setup_driver()
-            
-            logger.info("📄 Завантажую сторінку Otodom...")
-            driver.get(url)
+            driver = self.driver_pool.acquire()
             
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            self.block_page_resources(driver, 'otodom')
             
-            time.sleep(5)
+            logger.info("📄 Завантажую сторінку Otodom...")
+            with stage('driver_get', 'otodom'):
+                driver.get(url)
+                self.waits.page_ready(driver)
+                self.waits.network_idle(driver)
             logger.info("✅ Сторінка Otodom завантажена")
             
-            gallery_clicked = self.find_and_click_photos_button(driver)
-            
-            if gallery_clicked:
-                logger.info("✅ Перейшли на сторінку галереї")
-                time.sleep(5)
-                photo_urls = self.extract_unique_photos_from_gallery(driver)
-            else:
-                logger.warning("❌ Не вдалося перейти на галерею")
-                photo_urls = []
+            with stage('gallery', 'otodom'):
+                with span('find_and_click_photos_button'):
+                    gallery_clicked = self.find_and_click_photos_button(driver)
+                
+                if gallery_clicked:
+                    logger.info("✅ Перейшли на сторінку галереї")
+                    self.waits.page_ready(driver)
+                    self.waits.gallery_images(driver)
+                    self.waits.network_idle(driver)
+                    photo_urls = self.extract_unique_photos_from_gallery(driver)
+                else:
+                    logger.warning("❌ Не вдалося перейти на галерею")
+                    photo_urls = []
             
             high_quality_urls = [self.get_high_quality_url(url) for url in photo_urls]
             logger.info(f"🎯 Фінальний результат Otodom: {len(high_quality_urls)} фото")
@@ -878,71 +2509,99 @@ class FixedGalleryExtractor:
             
         except Exception as e:
             logger.error(f"❌ Критична помилка пошуку Otodom: {e}")
+            broken = True
             return []
         finally:
             if driver:
-                driver.quit()
-                logger.info("🔚 Driver закрито")
+                self.driver_pool.release(driver, broken=broken)
+                logger.info("🔚 Driver повернуто в пул")
 
     def extract_olx_photos(self, url):
         """Витягує фото з OLX з гортанням галереї"""
         driver = None
+        broken = False
         try:
             logger.info(f"🚀 Запуск пошуку OLX для: {url}")
-            driver = self.setup_driver()
-            
-            logger.info("📄 Завантажую сторінку OLX...")
-            driver.get(url)
+            driver = self.driver_pool.acquire()
             
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            self.block_page_resources(driver, 'olx')
             
-            time.sleep(5)
+            logger.info("📄 Завантажую сторінку OLX...")
+            with stage('driver_get', 'olx'):
+                driver.get(url)
+                self.waits.page_ready(driver)
+                self.waits.network_idle(driver)
             logger.info("✅ Сторінка OLX завантажена")
             
-            initial_photos = self.extract_olx_photo_urls(driver)
-            logger.info(f"📸 Фото без галереї: {len(initial_photos)}")
-            
-            gallery_opened = self.click_olx_gallery(driver)
-            gallery_photos = []
-            
-            if gallery_opened:
-                logger.info("✅ Галерея OLX відкрита, гортаю фото...")
-                gallery_photos = self.navigate_olx_gallery(driver)
-                logger.info(f"📸 Фото з галереї: {len(gallery_photos)}")
-            else:
-                logger.warning("❌ Не вдалося відкрити галерею OLX")
+            with stage('gallery', 'olx'):
+                initial_photos = self.extract_olx_photo_urls(driver)
+                logger.info(f"📸 Фото без галереї: {len(initial_photos)}")
+                
+                with span('click_olx_gallery'):
+                    gallery_opened = self.click_olx_gallery(driver)
+                gallery_photos = []
+                
+                if gallery_opened:
+                    logger.info("✅ Галерея OLX відкрита, гортаю фото...")
+                    gallery_photos = self.navigate_olx_gallery(driver)
+                    logger.info(f"📸 Фото з галереї: {len(gallery_photos)}")
+                else:
+                    logger.warning("❌ Не вдалося відкрити галерею OLX")
             
-            all_photos = list(set(initial_photos + gallery_photos))
+            # Один і той самий ID фото у різних ;s= варіантах - це дублікат
+            all_photos = self.unique_by_photo_id(initial_photos + gallery_photos)
             logger.info(f"🎯 Всього унікальних фото OLX: {len(all_photos)}")
             
             return all_photos
             
         except Exception as e:
             logger.error(f"❌ Критична помилка пошуку OLX: {e}")
+            broken = True
             return []
         finally:
             if driver:
-                driver.quit()
-                logger.info("🔚 Driver закрито")
+                self.driver_pool.release(driver, broken=broken)
+                logger.info("🔚 Driver повернуто в пул")
 
-    async def get_gallery_photos(self, url):
-        """Отримує фото через сторінку галереї (Otodom)"""
+    async def get_gallery_photos(self, url, session):
+        """Отримує фото Otodom: спочатку з JSON сторінки, Chrome - лише як запасний варіант"""
         logger.info(f"🎯 Початок обробки Otodom: {url}")
-        photo_urls = self.extract_photos_via_gallery(url)
+        photo_urls = await asyncio.to_thread(listing_cache.get, url)
+        if photo_urls:
+            logger.info(f"⚡ Оголошення з кешу: {len(photo_urls)} фото")
+            return photo_urls
+        
+        with stage('listing_http', 'otodom'):
+            photo_urls = await self.extract_otodom_photos_http(url, session)
+        if not photo_urls:
+            logger.info("🔄 Швидкий шлях Otodom не спрацював, запускаю Chrome")
+            async with job_scheduler.slot('browser'):
+                photo_urls = await extraction_executor.run(self.extract_photos_via_gallery, url)
+        await asyncio.to_thread(listing_cache.put, url, photo_urls)
         logger.info(f"🏁 Завершено обробку Otodom: {len(photo_urls)} фото")
         return photo_urls
 
-    async def get_olx_photos(self, url):
-        """Отримує фото з OLX"""
+    async def get_olx_photos(self, url, session):
+        """Отримує фото з OLX: спочатку зі стану сторінки, Chrome - лише як запасний варіант"""
         logger.info(f"🎯 Початок обробки OLX: {url}")
-        photo_urls = self.extract_olx_photos(url)
+        photo_urls = await asyncio.to_thread(listing_cache.get, url)
+        if photo_urls:
+            logger.info(f"⚡ Оголошення з кешу: {len(photo_urls)} фото")
+            return photo_urls
+        
+        with stage('listing_http', 'olx'):
+            photo_urls = await self.extract_olx_photos_http(url, session)
+        if not photo_urls:
+            logger.info("🔄 Швидкий шлях OLX не спрацював, запускаю Chrome")
+            async with job_scheduler.slot('browser'):
+                photo_urls = await extraction_executor.run(self.extract_olx_photos, url)
+        await asyncio.to_thread(listing_cache.put, url, photo_urls)
         logger.info(f"🏁 Завершено обробку OLX: {len(photo_urls)} фото")
         return photo_urls
 
 # Глобальний екстрактор
 photo_extractor = FixedGalleryExtractor()
+metrics.gauge('bot_chrome_instances_alive', lambda: photo_extractor.driver_pool.get_stats()['alive'])
 
 # === 🔐 ACCESS CONTROL FUNCTIONS ===
 async def check_access(update: Update, context: ContextTypes.DEFAULT_TYPE = None) -> bool:
@@ -1030,6 +2689,94 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     users_list += f"\n📊 Всього: {len(ALLOWED_USERS)} користувачів"
     await update.message.reply_text(users_list)
 
+@admin_required
+@log_command
+async def invalidate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Видаляє оголошення з кешу, щоб наступний запит витягнув фото заново (тільки для адміна)"""
+    if not context.args or len(context.args) != 1:
+        await update.message.reply_text("ℹ️ Використання: /invalidate <посилання на оголошення>")
+        return
+    
+    if await asyncio.to_thread(listing_cache.invalidate, context.args[0]):
+        await update.message.reply_text("🗑️ Оголошення видалено з кешу")
+    else:
+        await update.message.reply_text("ℹ️ Оголошення не знайдено в кеші")
+
+@admin_required
+@log_command
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Профілює наступні N оголошень і надсилає файл профілю (тільки для адміна)"""
+    usage = (
+        "ℹ️ Використання: /profile <N> [cprofile|sample]\n\n"
+        "cprofile - детальний профіль потоку event loop\n"
+        "sample - семплювання стеків усіх потоків (включно з Chrome-витягуванням)"
+    )
+    if not context.args or len(context.args) > 2:
+        await update.message.reply_text(usage)
+        return
+    
+    try:
+        jobs = int(context.args[0])
+    except ValueError:
+        await update.message.reply_text("❌ N має бути числом.")
+        return
+    
+    mode = context.args[1].lower() if len(context.args) == 2 else 'cprofile'
+    if mode not in ('cprofile', 'sample') or not 1 <= jobs <= PROFILE_MAX_JOBS:
+        await update.message.reply_text(usage + f"\n\nN - від 1 до {PROFILE_MAX_JOBS}")
+        return
+    
+    if not job_profiler.arm(jobs, mode):
+        await update.message.reply_text("ℹ️ Профілювання вже увімкнено")
+        return
+    
+    await update.message.reply_text(f"🔬 Профілювання {mode} для наступних {jobs} оголошень увімкнено")
+
+@admin_required
+@log_command
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показує статистику навантаження (тільки для адміна)"""
+    executor_stats = extraction_executor.get_stats()
+    scheduler_stats = job_scheduler.get_stats()
+    pool_stats = photo_extractor.driver_pool.get_stats()
+    wait_stats = photo_extractor.waits.get_stats()
+    http_stats = http_client.get_stats()
+    file_id_stats = file_id_cache.get_stats()
+    listing_stats = listing_cache.get_stats()
+    disk_stats = image_disk_cache.get_stats()
+    
+    message = (
+        f"📊 Статистика бота:\n\n"
+        f"🚦 Черга Chrome: {scheduler_stats['browser']['active']}/{scheduler_stats['browser']['limit']} активних, "
+        f"{scheduler_stats['browser']['waiting']} чекають\n"
+        f"🚦 Черга фото: {scheduler_stats['image']['active']}/{scheduler_stats['image']['limit']} активних, "
+        f"{scheduler_stats['image']['waiting']} чекають\n"
+        f"🧵 Витягування: {executor_stats['active']}/{executor_stats['workers']} активних, "
+        f"{executor_stats['queued']} в черзі\n"
+        f"✅ Завершено: {executor_stats['completed']}\n"
+        f"⏳ Середнє очікування в черзі: {executor_stats['avg_queue_wait']:.2f}с\n"
+        f"⏱️ Середній час витягування: {executor_stats['avg_extraction_time']:.2f}с\n\n"
+        f"🌐 Chrome: {pool_stats['alive']}/{pool_stats['max']} запущено, {pool_stats['idle']} вільних\n"
+        f"♻️ Запущено всього: {pool_stats['created']}, перезапущено: {pool_stats['recycled']}\n\n"
+        f"🔌 HTTP: {http_stats['requests']} запитів, з'єднань нових {http_stats['created']}, "
+        f"повторних {http_stats['reused']} ({http_stats['hit_rate']:.0%})\n"
+        f"⚡ Кеш file_id: {file_id_stats['hits']} влучань, {file_id_stats['misses']} промахів\n"
+        f"🗂️ Кеш оголошень: {listing_stats['hits']} влучань, {listing_stats['misses']} промахів, "
+        f"{listing_stats['size']} записів\n"
+        f"💽 Кеш фото: {disk_stats['hits']} влучань, {disk_stats['misses']} промахів, "
+        f"{disk_stats['bytes'] / 1024 / 1024:.1f} МБ\n"
+        f"🔗 Об'єднано однакових запитів: {listing_flights.coalesced} (унікальних: {listing_flights.leaders})"
+    )
+    
+    if wait_stats:
+        message += "\n\n⏳ Очікування в браузері (середнє / макс / таймаути):\n"
+        for step, timing in wait_stats.items():
+            message += (
+                f"• {step}: {timing['total'] / timing['count']:.2f}с / "
+                f"{timing['max']:.2f}с / {timing['timeouts']}\n"
+            )
+    await update.message.reply_text(message)
+
 @log_command
 async def my_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показує ID користувача"""
@@ -1051,130 +2798,415 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("✅ Бот працює нормально! 🚀")
 
 # === 🤖 BOT FUNCTIONALITY ===
-async def process_and_send_photos(photo_urls, update, session, is_olx=False):
-    """Обробляє та відправляє фото альбомами"""
+def is_stale_file_id_error(error):
+    """True, якщо Telegram відхилив file_id (видалений або недійсний), а не саму відправку"""
+    message = str(error).lower()
+    return isinstance(error, BadRequest) and any(
+        marker in message for marker in ('file identifier', 'file_id', 'wrong remote file')
+    )
+
+async def process_and_send_photos(photo_urls, update, session, is_olx=False, caption=""):
+    """Обробляє та відправляє фото альбомами: альбом N відправляється, поки завантажується N+1"""
     if not photo_urls:
         logger.warning("❌ Немає фото для обробки")
         return 0
         
     logger.info(f"📦 Обробка {len(photo_urls)} фото...")
+    site = 'olx' if is_olx else 'otodom'
     success_count = 0
-    sent_hashes = set()
-    sent_photo_ids = set()
+    deduplicator = PerceptualDeduplicator(PHASH_THRESHOLD)
+    
+    # Дублікати за ID відкидаємо ще до завантаження
+    unique_urls = []
+    seen_photo_ids = set()
+    for photo_url in photo_urls:
+        photo_id_match = re.search(r'/files/([^/]+)', photo_url)
+        photo_id = photo_id_match.group(1) if photo_id_match else photo_url
+        
+        if photo_id in seen_photo_ids:
+            logger.info(f"🚫 Пропущено дублікат за ID: {photo_id}")
+            continue
+        seen_photo_ids.add(photo_id)
+        unique_urls.append(photo_url)
+    
+    url_chunks = [unique_urls[i:i + PHOTOS_PER_ALBUM] for i in range(0, len(unique_urls), PHOTOS_PER_ALBUM)]
+    logger.info(f"📚 Створено {len(url_chunks)} альбомів")
+    
+    # Кеш file_id читаємо для всіх фото одразу: хеші вже відправлених фото мають бути в
+    # дедуплікаторі раніше за будь-яке завантажене, інакше майже дублікат, відкинутий
+    # минулого разу, при повторному запиті пройде
+    cached_file_ids = await asyncio.to_thread(
+        file_id_cache.get_many, [photo_cache_key(photo_url, is_olx) for photo_url in unique_urls]
+    )
+    for _, image_hash in cached_file_ids.values():
+        deduplicator.remember(image_hash)
     
-    photo_chunks = [photo_urls[i:i + PHOTOS_PER_ALBUM] for i in range(0, len(photo_urls), PHOTOS_PER_ALBUM)]
-    logger.info(f"📚 Створено {len(photo_chunks)} альбомів")
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    album_queue = asyncio.Queue(maxsize=ALBUM_QUEUE_DEPTH)
     
-    for chunk_index, photo_chunk in enumerate(photo_chunks):
-        logger.info(f"🎞️ Обробка альбому {chunk_index + 1}/{len(photo_chunks)}")
-        media_group = []
-        chunk_success_count = 0
+    async def download(photo_url, cache_key):
+        """Повертає оброблене фото з дискового кешу або завантажує й обробляє його"""
+        cached = await asyncio.to_thread(image_disk_cache.get, cache_key)
+        if cached:
+            # Байти, а не Path: InputMediaPhoto читає файл синхронно в event loop і не закриває його
+            cached['media'] = cached['data']
+            cached['size'] = len(cached['data'])
+            metrics.inc('bot_photos_total', outcome='cached', site=site)
+            return cached
         
-        for i, photo_url in enumerate(photo_chunk):
-            try:
-                logger.info(f"🖼️ [{i+1}/{len(photo_chunk)}] Обробка фото...")
-                
-                photo_id_match = re.search(r'/files/([^/]+)', photo_url)
-                photo_id = photo_id_match.group(1) if photo_id_match else photo_url
-                
-                if photo_id in sent_photo_ids:
-                    logger.info(f"🚫 Пропущено дублікат за ID: {photo_id}")
-                    continue
+        async with semaphore:
+            with stage('download_image', site, url=photo_url):
+                image_data = await photo_extractor.download_image(photo_url, session)
+        if not image_data:
+            metrics.inc('bot_photos_total', outcome='failed', site=site)
+            return None
+        metrics.inc('bot_photos_total', outcome='downloaded', site=site)
+        metrics.inc('bot_bytes_in_total', len(image_data), site=site)
+        
+        with stage('encode', site):
+            processed = await image_processor.process(image_data, not is_olx)
+        processed['media'] = processed['data']
+        processed['size'] = len(processed['data']) if processed['data'] is not None else 0
+        if processed['data'] is not None:
+            await asyncio.to_thread(
+                image_disk_cache.put, cache_key, processed['data'],
+                processed['width'], processed['height'], processed['hash']
+            )
+        return processed
+    
+    async def build_album(chunk_index, url_chunk):
+        """Збирає альбом у початковому порядку: з кешу file_id або паралельно завантажуючи фото"""
+        nonlocal success_count
+        logger.info(f"🎞️ Обробка альбому {chunk_index + 1}/{len(url_chunks)}")
+        album = []
+        
+        cache_keys = [photo_cache_key(photo_url, is_olx) for photo_url in url_chunk]
+        cached_count = sum(1 for cache_key in cache_keys if cache_key in cached_file_ids)
+        if cached_count:
+            logger.info(f"⚡ З кешу file_id: {cached_count}/{len(url_chunk)} фото")
+        
+        download_tasks = {
+            cache_key: asyncio.create_task(download(photo_url, cache_key))
+            for photo_url, cache_key in zip(url_chunk, cache_keys)
+            if cache_key not in cached_file_ids
+        }
+        
+        try:
+            for i, (photo_url, cache_key) in enumerate(zip(url_chunk, cache_keys)):
+                try:
+                    logger.info(f"🖼️ [{i+1}/{len(url_chunk)}] Обробка фото...")
                     
-                image = await photo_extractor.download_image(photo_url, session)
-                if not image:
-                    logger.warning("❌ Не вдалося завантажити зображення")
-                    continue
-                
-                width, height = image.size
-                logger.info(f"📐 Розмір: {width}x{height}")
-                
-                if width < MIN_WIDTH or height < MIN_HEIGHT:
-                    logger.info(f"🚫 Замалий розмір: {width}x{height}")
-                    continue
-                
-                image_hash = hashlib.md5(image.tobytes()).hexdigest()
-                if image_hash in sent_hashes:
-                    logger.info(f"🚫 Дублікат за вмістом: {image_hash}")
-                    continue
+                    # Підпис (якщо є) отримує лише перше фото першого альбому
+                    photo_caption = caption if chunk_index == 0 and not album else ""
                     
-                sent_hashes.add(image_hash)
-                sent_photo_ids.add(photo_id)
-                
-                if is_olx:
-                    processed_image = image
-                    logger.info("🔵 OLX фото - без обрізки водяних знаків")
-                else:
-                    processed_image = photo_extractor.remove_watermark(image)
-                    logger.info("🟢 Otodom фото - з обрізкою водяних знаків")
-                
-                output_bytes = BytesIO()
-                processed_image.save(output_bytes, format='JPEG', quality=90)
-                output_bytes.seek(0)
-                
-                media_group.append(
-                    InputMediaPhoto(
-                        media=output_bytes.getvalue(),
-                        caption=""
-                    )
-                )
-                
-                chunk_success_count += 1
-                success_count += 1
-                logger.info(f"✅ Додано до альбому: {chunk_index * PHOTOS_PER_ALBUM + chunk_success_count}")
-                
-            except Exception as e:
-                logger.error(f"❌ Помилка обробки фото: {e}")
+                    if cache_key in cached_file_ids:
+                        file_id, image_hash = cached_file_ids[cache_key]
+                        metrics.inc('bot_photos_total', outcome='cached', site=site)
+                        album.append({
+                            'url': photo_url,
+                            'key': cache_key,
+                            'cached': True,
+                            'size': 0,
+                            'hash': image_hash,
+                            'caption': photo_caption,
+                            'media': InputMediaPhoto(media=file_id, caption=photo_caption)
+                        })
+                        success_count += 1
+                        logger.info(f"✅ Додано до альбому з кешу: {chunk_index * PHOTOS_PER_ALBUM + len(album)}")
+                        continue
+                    
+                    processed = await download_tasks[cache_key]
+                    if not processed:
+                        logger.warning("❌ Не вдалося завантажити зображення")
+                        continue
+                    
+                    width, height = processed['width'], processed['height']
+                    logger.info(f"📐 Розмір: {width}x{height}")
+                    
+                    if processed['media'] is None:
+                        logger.info(f"🚫 Замалий розмір: {width}x{height}")
+                        metrics.inc('bot_photos_total', outcome='filtered', site=site)
+                        continue
+                    
+                    image_hash = processed['hash']
+                    if deduplicator.seen_similar(image_hash):
+                        logger.info(f"🚫 Дублікат за вмістом: {image_hash}")
+                        metrics.inc('bot_photos_total', outcome='deduped', site=site)
+                        continue
+                    
+                    if processed.get('passthrough'):
+                        logger.info("🔵 OLX фото - оригінальний JPEG без перекодування")
+                    elif is_olx:
+                        logger.info("🔵 OLX фото - без обрізки водяних знаків")
+                    else:
+                        logger.info("🟢 Otodom фото - з обрізкою водяних знаків")
+                    
+                    album.append({
+                        'url': photo_url,
+                        'key': cache_key,
+                        'cached': False,
+                        'size': processed['size'],
+                        'hash': image_hash,
+                        'caption': photo_caption,
+                        'media': InputMediaPhoto(media=processed['media'], caption=photo_caption)
+                    })
+                    
+                    success_count += 1
+                    logger.info(f"✅ Додано до альбому: {chunk_index * PHOTOS_PER_ALBUM + len(album)}")
+                    
+                except Exception as e:
+                    logger.error(f"❌ Помилка обробки фото: {e}")
+                    continue
+        finally:
+            for download_task in download_tasks.values():
+                if not download_task.done():
+                    download_task.cancel()
+        
+        return album
+    
+    async def refresh_cached_entries(album):
+        """Замінює застарілі file_id на свіжо завантажені фото"""
+        nonlocal success_count
+        stale_keys = [entry['key'] for entry in album if entry['cached']]
+        await asyncio.to_thread(file_id_cache.invalidate_many, stale_keys)
+        
+        refreshed = []
+        for entry in album:
+            if not entry['cached']:
+                refreshed.append(entry)
                 continue
+            processed = await download(entry['url'], entry['key'])
+            if processed and processed['media'] is not None:
+                refreshed.append({
+                    **entry,
+                    'cached': False,
+                    'size': processed['size'],
+                    'hash': processed['hash'],
+                    'media': InputMediaPhoto(media=processed['media'], caption=entry['caption'])
+                })
+            else:
+                success_count -= 1
+        return refreshed
+    
+    async def send_album(chunk_index, album):
+        """Відправляє альбом і запам'ятовує file_id нових фото"""
+        logger.info(f"📤 Відправка альбому {chunk_index + 1} з {len(album)} фото")
+        with stage('reply_media_group', site, album=chunk_index + 1, photos=len(album)):
+            messages = await update.message.reply_media_group(media=[entry['media'] for entry in album])
+        logger.info(f"✅ Альбом {chunk_index + 1} успішно відправлено")
+        metrics.inc('bot_bytes_out_total', sum(entry['size'] for entry in album), site=site)
         
-        if media_group:
+        new_file_ids = [
+            (entry['key'], message.photo[-1].file_id, entry['hash'])
+            for entry, message in zip(album, messages)
+            if not entry['cached'] and message.photo
+        ]
+        await asyncio.to_thread(file_id_cache.put_many, new_file_ids)
+    
+    async def send_album_respecting_flood_control(chunk_index, album):
+        """Відправляє альбом, а на RetryAfter чекає вказаний Telegram час і повторює"""
+        for attempt in range(ALBUM_SEND_RETRIES + 1):
+            try:
+                return await send_album(chunk_index, album)
+            except RetryAfter as e:
+                if attempt == ALBUM_SEND_RETRIES:
+                    raise
+                logger.warning(f"⏳ Flood control Telegram: чекаю {e.retry_after} с перед повтором")
+                await asyncio.sleep(e.retry_after)
+    
+    async def produce():
+        """Готує альбоми по черзі; чекає, якщо черга на відправку заповнена"""
+        try:
+            for chunk_index, url_chunk in enumerate(url_chunks):
+                album = await build_album(chunk_index, url_chunk)
+                await album_queue.put((chunk_index, album))
+        except Exception as e:
+            logger.error(f"❌ Помилка підготовки альбомів: {e}")
+        await album_queue.put(None)
+    
+    async def consume():
+        """Відправляє готові альбоми, витримуючи мінімальний інтервал між ними"""
+        last_sent_at = None
+        while True:
+            item = await album_queue.get()
+            if item is None:
+                break
+            
+            chunk_index, album = item
+            if not album:
+                logger.warning(f"⚠️ Альбом {chunk_index + 1} порожній")
+                continue
+            
+            if last_sent_at is not None:
+                delay = ALBUM_SEND_INTERVAL - (time.monotonic() - last_sent_at)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            
             try:
-                logger.info(f"📤 Відправка альбому {chunk_index + 1} з {chunk_success_count} фото")
-                await update.message.reply_media_group(media=media_group)
-                logger.info(f"✅ Альбом {chunk_index + 1} успішно відправлено")
-                await asyncio.sleep(1)
+                await send_album_respecting_flood_control(chunk_index, album)
+            except BadRequest as e:
+                if is_stale_file_id_error(e) and any(entry['cached'] for entry in album):
+                    logger.warning(f"⚠️ Telegram відхилив file_id з кешу, відправляю заново: {e}")
+                    try:
+                        album = await refresh_cached_entries(album)
+                        if album:
+                            await send_album_respecting_flood_control(chunk_index, album)
+                    except Exception as e:
+                        logger.error(f"❌ Помилка відправки альбому: {e}")
+                else:
+                    logger.error(f"❌ Помилка відправки альбому: {e}")
             except Exception as e:
+                # TimedOut/NetworkError не повторюємо: альбом міг дійти, повтор дав би дублікат
                 logger.error(f"❌ Помилка відправки альбому: {e}")
-        else:
-            logger.warning(f"⚠️ Альбом {chunk_index + 1} порожній")
+            last_sent_at = time.monotonic()
+    
+    producer = asyncio.create_task(produce())
+    try:
+        await consume()
+    finally:
+        if not producer.done():
+            producer.cancel()
     
     logger.info(f"🏁 Завершено обробку. Успішно: {success_count} фото")
     return success_count
 
-@log_command
-async def handle_property_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обробляє посилання на оголошення Otodom та OLX"""
+class SingleFlight:
+    """Об'єднує однакові запити, що виконуються одночасно: працює перший, решта чекають його результату"""
+    
+    def __init__(self):
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def run(self, key, func):
+        """Повертає (результат, True) для першого запиту або (результат першого, False) для дублікатів"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            logger.info(f"🔗 Запит уже виконується, чекаю на результат: {key}")
+            return await asyncio.shield(flight), False
+        
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.leaders += 1
+        try:
+            result = await func()
+            flight.set_result(result)
+            return result, True
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(e)
+                # Позначаємо виняток отриманим, якщо дублікатів не було
+                flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+
+# Однакові посилання, що обробляються одночасно
+listing_flights = SingleFlight()
+
+async def process_listing(url, update, feedback, is_olx, site_name, photo_urls=None, caption=""):
+    """Витягує (якщо треба) і відправляє фото оголошення; повертає (photo_urls, success_count)"""
+    session = http_client.session
+    
+    if photo_urls is None:
+        if is_olx:
+            photo_urls = await photo_extractor.get_olx_photos(url, session)
+        else:
+            photo_urls = await photo_extractor.get_gallery_photos(url, session)
+    
+    if not photo_urls:
+        return [], 0
+    
+    await feedback.set_text(f"📷 Знайдено {len(photo_urls)} фото на {site_name}! Обробка...")
+    logger.info(f"📊 Знайдено фото: {len(photo_urls)}")
+    
+    async with job_scheduler.slot('image'):
+        success_count = await process_and_send_photos(photo_urls, update, session, is_olx, caption=caption)
+    return photo_urls, success_count
+
+async def run_listing_flight(url, update, feedback, is_olx, site_name, caption):
+    """Перший запит витягує і відправляє фото; однакові запити, що прийшли паралельно,
+    чекають на нього і відправляють ті самі фото через кеш file_id"""
+    try:
+        (photo_urls, success_count), is_leader = await listing_flights.run(
+            normalize_listing_url(url),
+            lambda: process_listing(url, update, feedback, is_olx, site_name, caption=caption)
+        )
+        if not is_leader and photo_urls:
+            photo_urls, success_count = await process_listing(
+                url, update, feedback, is_olx, site_name, photo_urls=photo_urls, caption=caption
+            )
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise
+        logger.warning("⚠️ Основний запит скасовано, обробляю самостійно")
+        photo_urls, success_count = await process_listing(url, update, feedback, is_olx, site_name, caption=caption)
+    
+    return photo_urls, success_count
+
+async def deliver_listing(url, update, feedback, caption=""):
+    """Обробляє одне оголошення з об'єднанням однакових запитів; повертає (site_name, photo_urls, success_count)"""
+    is_olx = 'olx.pl' in url
+    site_name = "OLX" if is_olx else "Otodom"
+    site = site_name.lower()
+    trace_id = start_trace(user_id=update.effective_user.id, url=url)
+    logger.info(f"🧵 Трасування {trace_id}: {url}")
+    
+    metrics.inc('bot_jobs_started_total', site=site)
+    profile_token = job_profiler.job_started()
+    try:
+        with stage('job', site, url=url):
+            photo_urls, success_count = await run_listing_flight(url, update, feedback, is_olx, site_name, caption)
+    except BaseException:
+        metrics.inc('bot_jobs_failed_total', site=site)
+        raise
+    finally:
+        await send_profile(update, job_profiler.job_finished(profile_token))
+    
+    metrics.inc('bot_jobs_finished_total' if success_count > 0 else 'bot_jobs_failed_total', site=site)
+    return site_name, photo_urls, success_count
+
+async def send_profile(update, path):
+    """Надсилає адміну файл профілю, коли профілювання завершилось"""
+    if path is None:
+        return
+    try:
+        with open(path, 'rb') as profile_file:
+            await update.get_bot().send_document(
+                chat_id=ADMIN_ID,
+                document=profile_file,
+                filename=path.name,
+                caption=f"🔬 Профіль: {path.name}"
+            )
+    except Exception as e:
+        logger.error(f"❌ Не вдалося надіслати профіль: {e}")
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+async def handle_property_link(update: Update, url):
+    """Обробляє посилання на оголошення Otodom та OLX (url - посилання, знайдене в повідомленні)"""
+    log_user_command(update)
     if not await check_access(update):
         return
     
-    url = update.message.text.strip()
-    
     processing_msg = await update.message.reply_text("🔄 Пошук фото... Зачекайте ⏳")
+    feedback = QueueFeedback(processing_msg, processing_msg.text)
+    current_job.set({'user_id': update.effective_user.id, 'on_position': feedback.on_position})
     
     try:
         logger.info(f"👤 Користувач надіслав: {url}")
         
-        if 'olx.pl' in url:
-            photo_urls = await photo_extractor.get_olx_photos(url)
-            is_olx = True
-            site_name = "OLX"
-        else:
-            photo_urls = await photo_extractor.get_gallery_photos(url)
-            is_olx = False
-            site_name = "Otodom"
+        site_name, photo_urls, success_count = await deliver_listing(url, update, feedback)
         
         if not photo_urls:
             logger.warning(f"❌ Фото не знайдено на {site_name}")
             await processing_msg.edit_text(f"❌ Фото не знайдено на {site_name}")
             return
         
-        await processing_msg.edit_text(f"📷 Знайдено {len(photo_urls)} фото на {site_name}! Обробка...")
-        logger.info(f"📊 Знайдено фото: {len(photo_urls)}")
-        
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            success_count = await process_and_send_photos(photo_urls, update, session, is_olx)
-        
         if success_count > 0:
             await update.message.reply_text(f"✅ Готово! Завантажено {success_count} фото з {site_name}")
             logger.info(f"🎉 Успішно завершено: {success_count} фото")
@@ -1199,7 +3231,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• 🖼️ Групую фото по 10 штук в альбоми\n"
         "• 🔄 Гортаю галерею OLX для отримання всіх фото\n"
         "• ✂️ Видаляю водяні знаки (тільки для Otodom)\n"
-        "• 🚫 Фільтрую дублікати\n\n"
+        "• 🚫 Фільтрую дублікати\n"
+        "• 📚 Обробляю кілька посилань з одного повідомлення або .txt файлу\n\n"
         "📩 Просто надішліть мені посилання на оголошення з:\n"
         "• Otodom.pl\n"
         "• OLX.pl\n\n"
@@ -1231,6 +3264,82 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "3. Очікуйте на підтвердження доступу"
     )
 
+async def handle_bulk_links(update: Update, urls):
+    """Паралельно обробляє кілька оголошень і надсилає загальний підсумок"""
+    unique_urls = list(OrderedDict((normalize_listing_url(url), url) for url in urls).values())
+    if len(unique_urls) > BULK_MAX_LINKS:
+        await update.message.reply_text(
+            f"⚠️ Забагато посилань ({len(unique_urls)}), оброблю перші {BULK_MAX_LINKS}"
+        )
+        unique_urls = unique_urls[:BULK_MAX_LINKS]
+    
+    total = len(unique_urls)
+    logger.info(f"📚 Пакетна обробка {total} оголошень від {update.effective_user.id}")
+    await update.message.reply_text(f"📚 Знайдено {total} оголошень. Обробляю до {BULK_CONCURRENCY} одночасно...")
+    
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    
+    async def run_one(index, url):
+        async with semaphore:
+            listing_msg = await update.message.reply_text(f"🔄 [{index}/{total}] Пошук фото... ⏳\n{url}")
+            feedback = QueueFeedback(listing_msg, listing_msg.text)
+            current_job.set({'user_id': update.effective_user.id, 'on_position': feedback.on_position})
+            
+            try:
+                site_name, photo_urls, success_count = await deliver_listing(
+                    url, update, feedback, caption=f"[{index}/{total}] {url}"
+                )
+            except Exception as e:
+                logger.error(f"💥 Помилка пакетної обробки {url}: {e}")
+                await listing_msg.edit_text(f"❌ [{index}/{total}] Помилка\n{url}")
+                return url, 0
+            
+            if success_count > 0:
+                await listing_msg.edit_text(f"✅ [{index}/{total}] {success_count} фото з {site_name}\n{url}")
+            elif not photo_urls:
+                await listing_msg.edit_text(f"❌ [{index}/{total}] Фото не знайдено на {site_name}\n{url}")
+            else:
+                await listing_msg.edit_text(f"❌ [{index}/{total}] Не вдалося завантажити фото\n{url}")
+            return url, success_count
+    
+    results = await asyncio.gather(*(run_one(index, url) for index, url in enumerate(unique_urls, 1)))
+    
+    succeeded = sum(1 for _, success_count in results if success_count > 0)
+    photos = sum(success_count for _, success_count in results)
+    summary = f"📊 Пакет завершено: {succeeded}/{total} оголошень, {photos} фото\n\n"
+    for index, (url, success_count) in enumerate(results, 1):
+        mark = "✅" if success_count > 0 else "❌"
+        summary += f"{mark} [{index}] {success_count} фото - {url}\n"
+    
+    await update.message.reply_text(summary, disable_web_page_preview=True)
+    logger.info(f"🎉 Пакет завершено: {succeeded}/{total} оголошень, {photos} фото")
+
+@log_command
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обробка .txt файлу зі списком посилань"""
+    if not await check_access(update):
+        return
+    
+    document = update.message.document
+    if document.file_size and document.file_size > BULK_FILE_MAX_BYTES:
+        await update.message.reply_text("❌ Файл завеликий. Максимум 256 КБ")
+        return
+    
+    try:
+        file = await document.get_file()
+        content = await file.download_as_bytearray()
+    except Exception as e:
+        logger.error(f"❌ Помилка завантаження файлу: {e}")
+        await update.message.reply_text("❌ Не вдалося прочитати файл")
+        return
+    
+    urls = extract_listing_urls(bytes(content).decode('utf-8', errors='ignore'))
+    if not urls:
+        await update.message.reply_text("❌ У файлі не знайдено посилань на Otodom або OLX")
+        return
+    
+    await handle_bulk_links(update, urls)
+
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обробка текстовых повідомлень"""
     if not await check_access(update):
@@ -1238,8 +3347,11 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     text = update.message.text
     if text and not text.startswith('/'):
-        if re.match(r"^https?://(www\.)?(otodom\.pl|olx\.pl)/", text):
-            await handle_property_link(update, context)
+        urls = extract_listing_urls(text)
+        if len(urls) > 1:
+            await handle_bulk_links(update, urls)
+        elif urls:
+            await handle_property_link(update, urls[0])
         else:
             await update.message.reply_text(
                 "📩 Надішліть посилання на оголошення Otodom або OLX\n\n"
@@ -1252,11 +3364,33 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.error(f"Помилка: {context.error}")
 
+async def on_startup(application):
+    """Прогріває ресурси після ініціалізації бота"""
+    await http_client.start()
+    await metrics_server.start()
+    photo_extractor.driver_pool.reopen()
+    threading.Thread(target=photo_extractor.driver_pool.warm_up, daemon=True).start()
+
+async def on_shutdown(application):
+    """Звільняє ресурси при зупинці бота"""
+    await http_client.close()
+    await metrics_server.stop()
+    await asyncio.to_thread(photo_extractor.driver_pool.close_all)
+    image_processor.shutdown()
+
 def create_bot_application():
     """Створює та налаштовує бота"""
     UserManager.load_users()
     
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+    # concurrent_updates дозволяє обробляти інші повідомлення, поки триває витягування
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(True)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
@@ -1266,12 +3400,139 @@ def create_bot_application():
     application.add_handler(CommandHandler("add_user", add_user))
     application.add_handler(CommandHandler("remove_user", remove_user))
     application.add_handler(CommandHandler("list_users", list_users))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("invalidate", invalidate))
+    application.add_handler(CommandHandler("profile", profile))
     
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    application.add_handler(MessageHandler(filters.Document.TXT, handle_document))
     application.add_error_handler(error_handler)
     
     return application
 
+# === 🌐 WEBHOOK ===
+class WebhookServer:
+    """Вбудований aiohttp-сервер: приймає оновлення від Telegram і віддає стан бота"""
+    
+    def __init__(self, application):
+        self.application = application
+        self.runner = None
+        self.started_at = time.monotonic()
+        self.draining = False
+        self.received = 0
+        self.rejected = 0
+    
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_get('/health', self.handle_health)
+        return app
+    
+    async def handle_update(self, request):
+        """Перевіряє секрет і ставить оновлення в чергу бота"""
+        if WEBHOOK_SECRET:
+            token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+            if not hmac.compare_digest(token, WEBHOOK_SECRET):
+                self.rejected += 1
+                logger.warning(f"🚫 Вебхук: невірний секретний токен від {request.remote}")
+                return web.Response(status=403)
+        
+        if self.draining:
+            # Telegram повторить доставку пізніше, вже на новий екземпляр
+            return web.Response(status=503)
+        
+        try:
+            data = await request.json()
+        except ValueError:
+            self.rejected += 1
+            return web.Response(status=400)
+        
+        update = Update.de_json(data, self.application.bot)
+        if update is None:
+            self.rejected += 1
+            return web.Response(status=400)
+        
+        self.received += 1
+        # Обробка йде через чергу застосунку: відповідаємо Telegram одразу, не чекаючи на фото
+        await self.application.update_queue.put(update)
+        return web.Response(status=200)
+    
+    async def handle_health(self, request):
+        return web.json_response({
+            'status': 'draining' if self.draining else 'ok',
+            'mode': 'webhook',
+            'uptime': round(time.monotonic() - self.started_at),
+            'received': self.received,
+            'rejected': self.rejected,
+            'queued': self.application.update_queue.qsize(),
+        }, status=503 if self.draining else 200)
+    
+    async def start(self):
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '0.0.0.0', WEBHOOK_PORT).start()
+        logger.info(f"🌐 Вебхук слухає порт {WEBHOOK_PORT}, шлях {WEBHOOK_PATH}")
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def drain_webhook(application, server):
+    """Доробляє поточні задачі, поки сервер відповідає 503, і лише потім закриває порт"""
+    # Нові оновлення більше не приймаємо (503 - Telegram повторить доставку),
+    # а /health показує оркестратору, що екземпляр зупиняється
+    server.draining = True
+    try:
+        if application.running:
+            try:
+                await asyncio.wait_for(application.stop(), SHUTDOWN_DRAIN_TIMEOUT)
+                logger.info("✅ Усі поточні задачі завершено")
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Задачі не завершились за {SHUTDOWN_DRAIN_TIMEOUT} с, зупиняю примусово")
+    finally:
+        await server.stop()
+
+async def run_webhook(application):
+    """Повний життєвий цикл бота в режимі вебхука з плавною зупинкою"""
+    if not WEBHOOK_SECRET:
+        logger.warning("⚠️ WEBHOOK_SECRET не задано - вебхук приймає запити без перевірки")
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+    
+    server = WebhookServer(application)
+    
+    # Без run_polling/run_webhook хуки post_init/post_shutdown треба викликати самостійно
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            logger.info(f"✅ Вебхук зареєстровано: {WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH}")
+        else:
+            logger.info("ℹ️ WEBHOOK_URL не задано - реєстрація вебхука пропущена (локальний режим)")
+        
+        await stop_event.wait()
+        logger.info("🛑 Отримано сигнал зупинки, завершую поточні задачі...")
+    finally:
+        await drain_webhook(application, server)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
 def run_bot():
     """Запускає бота з обробкою помилок"""
     max_attempts = 10
@@ -1283,7 +3544,9 @@ def run_bot():
             attempt += 1
             logger.info(f"🚀 Спроба запуску бота #{attempt}")
             
-            wait_for_internet()
+            # У режимі вебхука Telegram сам доставить оновлення, коли з'явиться мережа
+            if BOT_MODE != 'webhook':
+                wait_for_internet()
             application = create_bot_application()
             
             logger.info("💫 Бот запускається...")
@@ -1292,6 +3555,10 @@ def run_bot():
             logger.info(f"🔐 Дозволені користувачі: {len(ALLOWED_USERS)}")
             
             # Запускаємо бота
+            if BOT_MODE == 'webhook':
+                asyncio.run(run_webhook(application))
+                break
+            
             application.run_polling(
                 poll_interval=3,
                 timeout=30,
@@ -1310,7 +3577,7 @@ def run_bot():
                 break
 
 # === 🚀 ЗАПУСК СИСТЕМИ ===
-if __name__ == "__main__":
+def main():
     try:
         logger.info("🚄 Запуск бота на Railway...")
         
@@ -1321,3 +3588,6 @@ if __name__ == "__main__":
         logger.info("🛑 Бот зупинено користувачем")
     except Exception as e:
         logger.critical(f"💥 Критична помилка: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Обробка фото без побічних ефектів при імпорті: модуль завантажують процеси пулу обробки"""
+import os
+import math
+import logging
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MIN_WIDTH = 275
+MIN_HEIGHT = 250
+
+# Довша сторона фото після обробки: Telegram все одно стискає фото до ~1280-2560 px
+TARGET_LONG_EDGE = int(os.environ.get('TARGET_LONG_EDGE', 2560))
+
+# Обмеження Telegram для фото: розмір файлу, сума сторін і співвідношення сторін
+TELEGRAM_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+TELEGRAM_PHOTO_MAX_DIMENSIONS_SUM = 10000
+TELEGRAM_PHOTO_MAX_RATIO = 20
+
+def available_cpu_count():
+    """Процесори, доступні цьому процесу (з урахуванням CPU affinity контейнера)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def crop_watermark(image):
+    """Обрізає нижню частину фото з водяним знаком (тільки для Otodom)"""
+    try:
+        width, height = image.size
+        logger.info(f"📐 Оригінальний розмір: {width}x{height}")
+        
+        if height > 800:
+            crop_height = int(height * 0.92)
+        elif height > 600:
+            crop_height = int(height * 0.90)
+        elif height > 400:
+            crop_height = int(height * 0.88)
+        else:
+            crop_height = int(height * 0.85)
+        
+        cropped_image = image.crop((0, 0, width, crop_height))
+        logger.info(f"📏 Обрізано: {width}x{height} -> {width}x{crop_height}")
+        return cropped_image
+    except Exception as e:
+        logger.error(f"❌ Помилка обрізки: {e}")
+        return image
+
+def compute_dhash(image):
+    """dHash: 64-бітний перцептивний хеш за зменшеною копією у відтінках сірого (hex-рядок)"""
+    # reducing_gap дає швидке зменшення без повного перетворення великого фото
+    thumbnail = image.resize((9, 8), Image.BILINEAR, reducing_gap=2.0).convert('L')
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return np.packbits(bits).tobytes().hex()
+
+def is_telegram_ready_jpeg(image, data_size):
+    """Перевіряє за заголовком, чи можна відправити файл у Telegram без перекодування"""
+    width, height = image.size
+    return (
+        image.format == 'JPEG'
+        and image.mode in ('RGB', 'L')
+        and data_size <= TELEGRAM_PHOTO_MAX_BYTES
+        and width + height <= TELEGRAM_PHOTO_MAX_DIMENSIONS_SUM
+        and max(width, height) <= TELEGRAM_PHOTO_MAX_RATIO * min(width, height)
+    )
+
+def shrink_to_long_edge(image, long_edge):
+    """Зменшує фото в ціле число разів так, щоб довша сторона не перевищувала long_edge"""
+    factor = math.ceil(max(image.size) / long_edge)
+    if factor <= 1:
+        return image
+    
+    # JPEG декодується одразу в масштабі 1/2, 1/4 або 1/8 (не менше запитаного розміру);
+    # повний ресемпл до точно long_edge коштував би в кілька разів більше за саме декодування
+    width, height = image.size
+    image.draft('RGB', (width // factor, height // factor))
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    
+    # Що не зменшив декодер (WebP, PNG, коефіцієнт 3, 5...), доробляє reduce (усереднення блоків)
+    factor = math.ceil(max(image.size) / long_edge)
+    if factor > 1:
+        image = image.reduce(factor)
+    return image
+
+def process_image_bytes(image_data, remove_watermark):
+    """Декодує, перевіряє розмір, хешує та кодує фото в JPEG (виконується в окремому процесі)"""
+    # Image.open читає лише заголовок; повне декодування - тільки якщо воно потрібне
+    image = Image.open(BytesIO(image_data))
+    width, height = image.size
+    result = {'width': width, 'height': height, 'hash': None, 'data': None, 'passthrough': False}
+    
+    if width < MIN_WIDTH or height < MIN_HEIGHT:
+        return result
+    
+    long_edge = max(width, height)
+    
+    if (not remove_watermark and long_edge <= TARGET_LONG_EDGE
+            and is_telegram_ready_jpeg(image, len(image_data))):
+        # Для хешу досить декодування в 1/8 масштабу
+        image.draft('L', (width // 8, height // 8))
+        result['hash'] = compute_dhash(image)
+        result['data'] = image_data
+        result['passthrough'] = True
+        return result
+    
+    image = shrink_to_long_edge(image, TARGET_LONG_EDGE)
+    
+    if image.mode in ('RGBA', 'P'):
+        image = image.convert('RGB')
+    
+    result['hash'] = compute_dhash(image)
+    
+    if remove_watermark:
+        image = crop_watermark(image)
+    
+    output_bytes = BytesIO()
+    image.save(output_bytes, format='JPEG', quality=90)
+    result['data'] = output_bytes.getvalue()
+    return result
+
+def process_image_in_worker(image_data, remove_watermark):
+    """process_image_bytes для пулу процесів: незмінені байти назад не пересилаються"""
+    result = process_image_bytes(image_data, remove_watermark)
+    if result['passthrough']:
+        result['data'] = None
+    return result
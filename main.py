@@ -0,0 +1,11 @@
+"""Точка входу контейнера.
+
+Процеси ImageProcessor стартують через spawn і заново виконують головний скрипт як
+__mp_main__. Якщо головним скриптом є bot.py, кожен процес імпортує весь бот
+(Selenium, telegram, кеші, логування). Тут імпорт бота схований під перевіркою
+__main__, тож процеси підвантажують лише image_pipeline.
+"""
+
+if __name__ == "__main__":
+    import bot
+    bot.main()
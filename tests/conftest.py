@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# bot.py читає налаштування при імпорті: тестовий токен і кеші в тимчасовому каталозі
+_workdir = Path(tempfile.mkdtemp(prefix='bot-tests-'))
+os.environ.update({
+    'BOT_TOKEN': '123456:test',
+    'CACHE_DB': str(_workdir / 'cache.sqlite3'),
+    'IMAGE_CACHE_DIR': str(_workdir / 'image_cache'),
+    'TRACE_FILE': str(_workdir / 'traces.jsonl'),
+    'METRICS_PORT': '0',
+})
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
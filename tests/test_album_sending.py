@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+import bot
+
+def make_update(responses):
+    """Update-заглушка: reply_media_group по черзі повертає або кидає значення з responses"""
+    calls = []
+    
+    async def reply_media_group(media):
+        calls.append(len(media))
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return [SimpleNamespace(photo=[SimpleNamespace(file_id=f"new-{i}")]) for i in range(len(media))]
+    
+    return SimpleNamespace(message=SimpleNamespace(reply_media_group=reply_media_group)), calls
+
+def cache_photos(prefix, count):
+    urls = [f"https://ireland.apollo.olxcdn.com/v1/files/{prefix}-{i}/image" for i in range(count)]
+    keys = [bot.photo_cache_key(url, True) for url in urls]
+    bot.file_id_cache.put_many([(key, f"cached-{i}", f"{0x0f0f0f0f0f0f0f0f * i:016x}") for i, key in enumerate(keys)])
+    return urls, keys
+
+def test_stale_file_id_error_detection():
+    assert bot.is_stale_file_id_error(BadRequest("Wrong file identifier/http url specified"))
+    assert not bot.is_stale_file_id_error(BadRequest("Message is too long"))
+    assert not bot.is_stale_file_id_error(RetryAfter(3))
+    assert not bot.is_stale_file_id_error(TimedOut())
+
+def test_retry_after_waits_and_keeps_cached_file_ids():
+    urls, keys = cache_photos('retry', 3)
+    update, calls = make_update([RetryAfter(0), 'ok'])
+    
+    sent = asyncio.run(bot.process_and_send_photos(urls, update, session=None, is_olx=True))
+    
+    assert sent == 3
+    assert calls == [3, 3]
+    assert len(bot.file_id_cache.get_many(keys)) == 3
+
+def test_network_error_does_not_invalidate_cache():
+    urls, keys = cache_photos('timeout', 2)
+    update, calls = make_update([TimedOut()])
+    
+    asyncio.run(bot.process_and_send_photos(urls, update, session=None, is_olx=True))
+    
+    assert calls == [2]
+    assert len(bot.file_id_cache.get_many(keys)) == 2
+
+def test_near_duplicate_stays_filtered_when_original_comes_from_cache(monkeypatch):
+    urls = [f"https://ireland.apollo.olxcdn.com/v1/files/dedup-{name}/image" for name in ('a', 'a-copy')]
+    # Копія відрізняється від оригіналу одним бітом dHash
+    hashes = {urls[0]: 'f0f0f0f0f0f0f0f0', urls[1]: 'f0f0f0f0f0f0f0f1'}
+    
+    async def download_image(url, session):
+        return url.encode()
+    
+    async def process(image_data, remove_watermark):
+        return {'width': 800, 'height': 600, 'hash': hashes[image_data.decode()], 'data': b'jpeg'}
+    
+    monkeypatch.setattr(bot.photo_extractor, 'download_image', download_image)
+    monkeypatch.setattr(bot.image_processor, 'process', process)
+    monkeypatch.setattr(bot.image_disk_cache, 'get', lambda cache_key: None)
+    monkeypatch.setattr(bot.image_disk_cache, 'put', lambda *args: None)
+    
+    update, calls = make_update(['ok'])
+    assert asyncio.run(bot.process_and_send_photos(urls, update, session=None, is_olx=True)) == 1
+    
+    # Повторний запит: оригінал береться з кешу file_id, копію знову відкидає дедуплікатор
+    update, calls = make_update(['ok'])
+    assert asyncio.run(bot.process_and_send_photos(urls, update, session=None, is_olx=True)) == 1
+    assert calls == [1]
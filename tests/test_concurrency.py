@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+
+def test_lane_grants_slots_round_robin_with_admin_first():
+    async def scenario():
+        lane = bot.JobLane('test', 1)
+        await lane.acquire(1)
+        granted = []
+        
+        async def job(user_id, name):
+            await lane.acquire(user_id)
+            granted.append(name)
+            lane.release()
+        
+        tasks = [asyncio.create_task(job(user_id, name)) for user_id, name in
+                 [(1, 'a1'), (1, 'a2'), (2, 'b1'), (bot.ADMIN_ID, 'admin')]]
+        await asyncio.sleep(0)
+        lane.release()
+        await asyncio.gather(*tasks)
+        return granted, lane.active
+    
+    granted, active = asyncio.run(scenario())
+    assert granted == ['admin', 'a1', 'b1', 'a2']
+    assert active == 0
+
+def test_lane_skips_waiter_cancelled_before_release():
+    async def scenario():
+        lane = bot.JobLane('test', 1)
+        await lane.acquire(1)
+        waiter = asyncio.create_task(lane.acquire(2))
+        await asyncio.sleep(0)
+        
+        # release() виконується раніше, ніж except скасованої задачі
+        waiter.cancel()
+        lane.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        state_after_cancel = (lane.active, lane.waiting())
+        
+        await asyncio.wait_for(lane.acquire(3), timeout=1)
+        return state_after_cancel, lane.active
+    
+    state_after_cancel, active = asyncio.run(scenario())
+    assert state_after_cancel == (0, 0)
+    assert active == 1
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    async def scenario():
+        flights = bot.SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'photos'
+        
+        results = await asyncio.gather(*(flights.run('key', work) for _ in range(3)))
+        return results, calls, flights
+    
+    results, calls, flights = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(results, key=lambda result: not result[1]) == [('photos', True), ('photos', False), ('photos', False)]
+    assert flights.leaders == 1 and flights.coalesced == 2
+    assert not flights._flights
+
+def test_single_flight_shares_leader_exception():
+    async def scenario():
+        flights = bot.SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+        
+        return await asyncio.gather(flights.run('key', work), flights.run('key', work), return_exceptions=True), flights
+    
+    results, flights = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not flights._flights
+
+def test_single_flight_follower_sees_cancelled_leader():
+    async def scenario():
+        flights = bot.SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(1)
+        
+        leader = asyncio.create_task(flights.run('key', work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run('key', work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        # Сам follower не скасовували: deliver_listing за цією ознакою виконує роботу сам
+        return follower.cancelling(), flights
+    
+    cancelling, flights = asyncio.run(scenario())
+    assert cancelling == 0
+    assert not flights._flights
+
+def test_late_queue_position_does_not_overwrite_running_status():
+    async def scenario():
+        shown = []
+        
+        async def edit_text(text):
+            # Редагування з позицією "повільне": без блокування воно лягло б після set_text
+            await asyncio.sleep(0.05 if 'позиція' in text else 0)
+            shown.append(text)
+        
+        feedback = bot.QueueFeedback(SimpleNamespace(edit_text=edit_text), "🔄 Пошук фото...")
+        position_edit = asyncio.create_task(feedback.on_position(2))
+        await asyncio.sleep(0)
+        await feedback.set_text("📷 Обробка...")
+        await position_edit
+        await feedback.on_position(1)
+        return shown
+    
+    shown = asyncio.run(scenario())
+    assert shown[-1] == "📷 Обробка..."
+    assert len(shown) == 2
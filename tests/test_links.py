@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+
+import bot
+
+def test_extract_strips_trailing_punctuation():
+    text = (
+        "Гляньте (https://www.olx.pl/d/oferta/mieszkanie-ID1.html), "
+        "а також https://www.otodom.pl/pl/oferta/dom-ID2. Дякую!"
+    )
+    assert bot.extract_listing_urls(text) == [
+        "https://www.olx.pl/d/oferta/mieszkanie-ID1.html",
+        "https://www.otodom.pl/pl/oferta/dom-ID2",
+    ]
+
+def test_single_link_inside_text_goes_to_single_link_path(monkeypatch):
+    delivered = []
+    
+    async def check_access(update):
+        return True
+    
+    async def handle_property_link(update, url):
+        delivered.append(url)
+    
+    monkeypatch.setattr(bot, 'check_access', check_access)
+    monkeypatch.setattr(bot, 'handle_property_link', handle_property_link)
+    update = SimpleNamespace(message=SimpleNamespace(text="ось це: https://www.olx.pl/d/oferta/kawalerka-ID3.html, дякую"))
+    
+    asyncio.run(bot.handle_text(update, None))
+    
+    assert delivered == ["https://www.olx.pl/d/oferta/kawalerka-ID3.html"]
+
+def test_single_link_path_checks_access(monkeypatch):
+    replies = []
+    
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+    
+    async def deliver_listing(*args, **kwargs):
+        raise AssertionError("оголошення оброблено без доступу")
+    
+    monkeypatch.setattr(bot, 'deliver_listing', deliver_listing)
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=-1, username='stranger', first_name='Stranger'),
+        message=SimpleNamespace(text="https://www.olx.pl/d/oferta/kawalerka-ID4.html", reply_text=reply_text),
+    )
+    
+    asyncio.run(bot.handle_property_link(update, "https://www.olx.pl/d/oferta/kawalerka-ID4.html"))
+    
+    assert len(replies) == 1 and replies[0].startswith("🔒")
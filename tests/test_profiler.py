@@ -0,0 +1,17 @@
+import bot
+
+def test_jobs_started_before_arm_are_not_counted():
+    profiler = bot.JobProfiler(0.01)
+    early = profiler.job_started()
+    assert early is None
+    
+    assert profiler.arm(1, 'sample')
+    token = profiler.job_started()
+    # Лише одне оголошення замовлено: наступне вже не профілюється
+    assert profiler.job_started() is None
+    
+    assert profiler.job_finished(early) is None
+    path = profiler.job_finished(token)
+    assert path is not None
+    path.unlink()
+    assert profiler.mode is None
@@ -0,0 +1,55 @@
+import socket
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+
+import bot
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_server_answers_503_while_draining(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(bot, 'WEBHOOK_PORT', port)
+    monkeypatch.setattr(bot, 'WEBHOOK_SECRET', None)
+    
+    async def scenario():
+        drain_started = asyncio.Event()
+        jobs_done = asyncio.Event()
+        
+        async def stop():
+            drain_started.set()
+            await jobs_done.wait()
+            application.running = False
+        
+        application = SimpleNamespace(running=True, stop=stop, update_queue=asyncio.Queue(), bot=None)
+        server = bot.WebhookServer(application)
+        await server.start()
+        
+        drain = asyncio.create_task(bot.drain_webhook(application, server))
+        await drain_started.wait()
+        
+        base = f"http://127.0.0.1:{port}"
+        async with aiohttp.ClientSession() as session:
+            async with session.post(base + bot.WEBHOOK_PATH, json={'update_id': 1}) as response:
+                assert response.status == 503
+            async with session.get(base + '/health') as response:
+                assert response.status == 503
+                assert (await response.json())['status'] == 'draining'
+            
+            jobs_done.set()
+            await drain
+            
+            # Порт закривається лише після того, як задачі доробились
+            try:
+                async with session.get(base + '/health'):
+                    raise AssertionError("сервер ще слухає після зупинки")
+            except aiohttp.ClientConnectionError:
+                pass
+        
+        assert application.update_queue.empty()
+    
+    asyncio.run(scenario())